@@ -0,0 +1,36 @@
+"""add tasks keyset index
+
+Revision ID: fab9534a27f5
+Revises: fea7664c20e2
+Create Date: 2026-10-18 11:02:17.284630
+
+Backs keyset pagination of GET /lockin/tasks, which pages each user's tasks
+in (created_at, taskid) order. Built CONCURRENTLY, outside a transaction.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fab9534a27f5'
+down_revision: Union[str, None] = 'fea7664c20e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_tasks_username_created_at_taskid', 'tasks', ['username', 'created_at', 'taskid'],
+            unique=False, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_tasks_username_created_at_taskid', table_name='tasks', postgresql_concurrently=True)
@@ -0,0 +1,43 @@
+"""add lockin lookup indexes
+
+Revision ID: fea7664c20e2
+Revises: caff2a4483ce
+Create Date: 2026-10-18 10:12:41.503118
+
+Indexes are built CONCURRENTLY so the tables stay writable while they build,
+which means this migration cannot run inside a transaction. If a build fails
+(e.g. duplicate (username, taskidbyfrontend) rows), Postgres leaves an INVALID
+index behind; drop it and fix the duplicates before re-running.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fea7664c20e2'
+down_revision: Union[str, None] = 'caff2a4483ce'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_tasks_username_taskidbyfrontend', 'tasks', ['username', 'taskidbyfrontend'],
+            unique=True, postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f('ix_saved_tasks_username'), 'saved_tasks', ['username'],
+            unique=False, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_saved_tasks_username'), table_name='saved_tasks', postgresql_concurrently=True)
+        op.drop_index('ix_tasks_username_taskidbyfrontend', table_name='tasks', postgresql_concurrently=True)
@@ -1,39 +1,116 @@
-from fastapi import Depends, HTTPException, status
+import hashlib
+import math
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from jose import JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models.user import User
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal
 from app.core.config import settings
+from app.core.metrics import RATE_LIMIT_REJECTED
+from app.core.security import decode_token
 from app.crud.user import get_user_by_email
+from app.services.data_version import get_data_version
+from app.services.principal_cache import principal_cache
+from app.services.rate_limit import hit
+from app.services.sessions import is_session_revoked
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_token_payload(token: str = Depends(oauth2_scheme)) -> dict:
+    """Claims of a valid, unrevoked access token."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
+        payload = decode_token(token)
     except JWTError:
         raise credentials_exception
-    user = get_user_by_email(db, email=email)
+    # Tokens issued before the type claim existed are access tokens
+    if payload.get("sub") is None or payload.get("type", "access") != "access":
+        raise credentials_exception
+    sid = payload.get("sid")
+    if sid is not None and await is_session_revoked(sid):
+        raise credentials_exception
+    return payload
+
+async def get_current_user(payload: dict = Depends(get_token_payload), db: AsyncSession = Depends(get_db)) -> User:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+    )
+    email: str = payload["sub"]
+    user = principal_cache.get(email)
+    if user is not None:
+        return user
+    generation = principal_cache.generation
+    user = await get_user_by_email(db, email=email)
     if user is None:
         raise credentials_exception
+    db.expunge(user)
+    principal_cache.set(email, user, generation)
     return user
 
-def get_current_active_admin(current_user=Depends(get_current_user)):
+async def get_current_active_admin(current_user=Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admins only")
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def check_etag(request: Request, response: Response, current_user=Depends(get_current_user)):
+    """Answer If-None-Match from the user's data version without running the handler.
+
+    The weak ETag covers the user's version plus the request path and query,
+    so each page or filter combination validates separately.
+    """
+    version = await get_data_version(current_user.id)
+    if version is None:
+        return
+    scope = hashlib.blake2b(f"{request.url.path}?{request.url.query}".encode(), digest_size=6).hexdigest()
+    opaque_tag = f'"{current_user.id}.{version}.{scope}"'
+    etag = f"W/{opaque_tag}"
+    # If-None-Match uses weak comparison, so the W/ prefix is ignored
+    if_none_match = request.headers.get("if-none-match", "")
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in candidates or opaque_tag in candidates:
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+def rate_limit(scope: str, window_seconds: int, per_ip: int | None = None, per_identity: int | None = None, field: str | None = None):
+    """Dependency enforcing a sliding-window limit, checked before the handler runs.
+
+    per_ip limits requests from one client address; per_identity limits
+    requests naming the same account, read from the JSON body's ``field``.
+    Either or both may be set. Over the limit the request gets a 429.
+    """
+    async def dependency(request: Request):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        buckets = {}
+        # Behind a proxy run uvicorn with --proxy-headers so this is the real client
+        if per_ip is not None and request.client is not None:
+            buckets[f"ratelimit:{scope}:ip:{request.client.host}"] = per_ip
+        if per_identity is not None:
+            try:
+                body = await request.json()
+            except ValueError:
+                body = None
+            identity = body.get(field) if isinstance(body, dict) else None
+            if isinstance(identity, str) and identity.strip():
+                buckets[f"ratelimit:{scope}:id:{identity.strip().lower()}"] = per_identity
+        if not buckets:
+            return
+        retry_after = await hit(buckets, window_seconds)
+        if retry_after:
+            RATE_LIMIT_REJECTED.labels(scope=scope).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please try again later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    return dependency
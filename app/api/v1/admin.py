@@ -1,8 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from app.api.deps import get_current_active_admin
+from app.core.metrics import render_metrics
 
 router = APIRouter()
 
 @router.get("/admin-only")
 def admin_dashboard(current_user = Depends(get_current_active_admin)):
     return {"msg": f"Hello admin {current_user.email}"}
+
+@router.get("/metrics")
+def admin_metrics(current_user = Depends(get_current_active_admin)):
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
@@ -1,51 +1,47 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from app.core.config import settings
 from fastapi.security import OAuth2PasswordRequestForm
 from app.db.models.user import User
-from app.db.session import SessionLocal
-from app.schemas.user import Token, PasswordResetRequest, PasswordResetConfirm, StartRegistrationRequest, VerifyOtpRequest, LoginRequest, ResendOtpRequest
+from app.api.deps import get_current_user, get_db, get_token_payload, rate_limit
+from app.schemas.user import Token, PasswordResetRequest, PasswordResetConfirm, StartRegistrationRequest, VerifyOtpRequest, LoginRequest, ResendOtpRequest, RefreshRequest
 from app.crud.user import get_user_by_email, get_user_by_username
-from app.core.security import verify_password, create_access_token, get_password_hash, create_password_reset_token, verify_password_reset_token, create_refresh_token
+from app.core.security import verify_password, create_access_token, get_password_hash, create_password_reset_token, verify_password_reset_token, create_refresh_token, decode_token
 from app.services.email import send_reset_email, send_registration_email, send_account_created_email, send_password_changed_email
-from app.services.redis_otp import save_otp_registration,get_otp_registration, delete_otp_registration, save_otp_reset, get_otp_reset, delete_otp_reset
+from app.services.redis_otp import save_otp_registration, consume_otp_registration, refresh_otp_registration, save_otp_reset, consume_otp_reset, refresh_otp_reset
+from app.services.principal_cache import invalidate_principal
+from app.services.sessions import start_session, rotate_refresh_token, revoke_session, revoke_all_sessions
 from app.utils.otp import generate_otp
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-@router.post("/start-registration")
-def start_registration(payload: StartRegistrationRequest, db: Session = Depends(get_db)):
+@router.post("/start-registration", dependencies=[Depends(rate_limit("start-registration", 600, per_ip=10, per_identity=3, field="email"))])
+async def start_registration(payload: StartRegistrationRequest, db: AsyncSession = Depends(get_db)):
     email = payload.email.lower()
     username = payload.username.lower()
 
-    if get_user_by_email(db, email):
+    if await get_user_by_email(db, email):
         raise HTTPException(400, "Email already registered")
-    if get_user_by_username(db, username):
+    if await get_user_by_username(db, username):
         raise HTTPException(400, "Username already taken")
 
     otp = generate_otp()
-    hashed_pw = get_password_hash(payload.password)
+    hashed_pw = await get_password_hash(payload.password)
 
-    save_otp_registration(email, username, hashed_pw, otp)
-    send_registration_email(email, otp)
+    await save_otp_registration(email, username, hashed_pw, otp)
+    await send_registration_email(email, otp)
 
     return {"msg": "OTP sent to email"}
 
 @router.post("/verify-otp")
-def verify_otp(payload: VerifyOtpRequest, db: Session = Depends(get_db)):
+async def verify_otp(payload: VerifyOtpRequest, request: Request, db: AsyncSession = Depends(get_db)):
     email = payload.email.lower()
-    reg = get_otp_registration(email)
+    reg = await consume_otp_registration(email, payload.otp)
 
-    if not reg or reg["otp"] != payload.otp:
+    if not reg:
         raise HTTPException(400, "Invalid or expired OTP")
 
     user = User(
@@ -55,137 +51,140 @@ def verify_otp(payload: VerifyOtpRequest, db: Session = Depends(get_db)):
         timezone=payload.timezone
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
-    delete_otp_registration(email)
-    send_account_created_email(email)
+    await send_account_created_email(email)
 
-    access_token = create_access_token({
-        "sub": email,
-        "name": user.username if user.username else email,
-    })
+    return await start_session(user, request, "otp", {"name": user.username if user.username else email})
 
-    refresh_token = create_refresh_token({
-        "sub": email
-    })
-
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer"
-    }
-
-@router.post("/resend-otp")
-def resend_otp(payload: ResendOtpRequest):
+@router.post("/resend-otp", dependencies=[Depends(rate_limit("resend-otp", 600, per_ip=10, per_identity=3, field="email"))])
+async def resend_otp(payload: ResendOtpRequest):
     email = payload.email.lower()
 
-    reg = get_otp_registration(email)
-    if not reg:
+    new_otp = generate_otp()
+    if not await refresh_otp_registration(email, new_otp):
         raise HTTPException(400, "No pending registration found for this email")
 
-    new_otp = generate_otp()
-    save_otp_registration(email, reg["username"], reg["hashed_password"], new_otp)
-    send_registration_email(email, new_otp)
+    await send_registration_email(email, new_otp)
 
     return {"msg": "A new OTP has been sent to your email."}
 
 
-@router.post("/login", response_model=Token)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    user = (
-        db.query(User)
-        .filter(
+@router.post("/login", response_model=Token, dependencies=[Depends(rate_limit("login", 300, per_ip=30, per_identity=10, field="username_or_email"))])
+async def login(payload: LoginRequest, request: Request, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(User)
+        .where(
             (User.email == payload.username_or_email.lower()) |
             (User.username == payload.username_or_email.lower())
         )
-        .first()
     )
+    user = result.scalars().first()
 
-    if not user or not verify_password(payload.password, user.hashed_password):
+    if not user or not await verify_password(payload.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
-    access_token = create_access_token({"sub": user.email})
-    refresh_token = create_refresh_token({"sub": user.email})
-    
-    return {
-    "access_token": access_token,
-    "refresh_token": refresh_token,
-    "token_type": "bearer"
-}
+    return await start_session(user, request, "password")
 
 
-@router.post("/request-password-reset")
-def request_password_reset(payload: PasswordResetRequest, db: Session = Depends(get_db)):
-    user = (
-        db.query(User)
-        .filter(
+@router.post("/request-password-reset", dependencies=[Depends(rate_limit("request-password-reset", 600, per_ip=10, per_identity=3, field="email_or_username"))])
+async def request_password_reset(payload: PasswordResetRequest, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(User)
+        .where(
             (User.email == payload.email_or_username.lower()) |
             (User.username == payload.email_or_username.lower())
         )
-        .first()
     )
+    user = result.scalars().first()
     if user:
         email = user.email.lower()
         otp = generate_otp()
-        save_otp_reset(email=email, otp=otp)
-        send_reset_email(email, otp)
+        await save_otp_reset(email=email, otp=otp)
+        await send_reset_email(email, otp)
 
     return {"msg": "If your account exists, a password reset email has been sent."}
 
 
 @router.post("/verify-reset-otp")
-def verify_reset_otp(payload: VerifyOtpRequest):
+async def verify_reset_otp(payload: VerifyOtpRequest):
     email = payload.email.lower()
-    reg = get_otp_reset(email)
+    reg = await consume_otp_reset(email, payload.otp)
 
-    if not reg or reg["otp"] != payload.otp:
+    if not reg:
         raise HTTPException(status_code=400, detail="Invalid or expired OTP")
     
-    delete_otp_reset(email)
     reset_token = create_password_reset_token(email)
     return {"reset_token": reset_token}
 
 
-@router.post("/resend-reset-otp")
-def resend_reset_otp(payload: ResendOtpRequest):
+@router.post("/resend-reset-otp", dependencies=[Depends(rate_limit("resend-reset-otp", 600, per_ip=10, per_identity=3, field="email"))])
+async def resend_reset_otp(payload: ResendOtpRequest):
     email = payload.email.lower()
 
-    reg = get_otp_reset(email)
-    if not reg:
+    new_otp = generate_otp()
+    if not await refresh_otp_reset(email, new_otp):
         raise HTTPException(400, "No pending password reset found for this email")
 
-    new_otp = generate_otp()
-    save_otp_reset(email=email, otp=new_otp)
-    send_reset_email(email, new_otp)
+    await send_reset_email(email, new_otp)
 
     return {"msg": "A new OTP has been sent to your email."}
 
 
 @router.post("/reset-password")
-def reset_password(data: PasswordResetConfirm, db: Session = Depends(get_db)):
+async def reset_password(data: PasswordResetConfirm, db: AsyncSession = Depends(get_db)):
     email = verify_password_reset_token(data.token)
-    user = get_user_by_email(db, email)
+    user = await get_user_by_email(db, email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    user.hashed_password = get_password_hash(data.new_password)
-    db.commit()
-    send_password_changed_email(user.email)
+    user.hashed_password = await get_password_hash(data.new_password)
+    await db.commit()
+    await invalidate_principal(user.email)
+    # Whoever knew the old password may still hold a session
+    await revoke_all_sessions(user.id)
+    await send_password_changed_email(user.email)
     return {"msg": "Password updated successfully"}
 
 
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(request: Request):
-    refresh_token = request.cookies.get("refresh_token")
+async def refresh_token(request: Request, body: Optional[RefreshRequest] = None, db: AsyncSession = Depends(get_db)):
+    refresh_token = (body.refresh_token if body else None) or request.cookies.get("refresh_token")
     if not refresh_token:
         raise HTTPException(status_code=401, detail="No refresh token provided")
     try:
-        payload = jwt.decode(refresh_token, settings.REFRESH_SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email = payload.get("sub")
+        payload = decode_token(refresh_token)
     except JWTError:
         raise HTTPException(status_code=403, detail="Invalid refresh token")
+    if payload.get("type") != "refresh" or not payload.get("sid") or not payload.get("jti"):
+        raise HTTPException(status_code=403, detail="Invalid refresh token")
+
+    rotated = await rotate_refresh_token(payload["sid"], payload["jti"])
+    if rotated is None:
+        raise HTTPException(status_code=403, detail="Refresh token revoked or already used")
+    user_id, new_jti = rotated
+    user = await db.get(User, user_id)
+    if user is None:
+        await revoke_session(user_id, payload["sid"])
+        raise HTTPException(status_code=403, detail="Invalid refresh token")
+
+    return {
+        "access_token": create_access_token({"sub": user.email, "sid": payload["sid"]}),
+        "refresh_token": create_refresh_token({"sub": user.email, "sid": payload["sid"], "jti": new_jti}),
+        "token_type": "bearer",
+    }
+
+
+@router.post("/logout")
+async def logout(payload: dict = Depends(get_token_payload), current_user: User = Depends(get_current_user)):
+    if payload.get("sid"):
+        await revoke_session(current_user.id, payload["sid"])
+    return {"msg": "Logged out"}
+
 
-    access_token = create_access_token({"sub": email})
-    return {"access_token": access_token}
\ No newline at end of file
+@router.post("/logout-all")
+async def logout_all(current_user: User = Depends(get_current_user)):
+    await revoke_all_sessions(current_user.id)
+    return {"msg": "Logged out of all sessions"}
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.services.health import readiness
+
+router = APIRouter()
+
+
+@router.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and its event loop is responsive."""
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz():
+    """Readiness: dependencies reachable, from a status cached for READINESS_CACHE_SECONDS."""
+    if readiness.started:
+        await readiness.refresh()
+    body = {"status": "ready" if readiness.ready else "unavailable", "checks": readiness.status}
+    return JSONResponse(body, status_code=200 if readiness.ready else 503)
@@ -1,12 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.models.lockin import Task, SavedTask
-from app.db.session import SessionLocal
-from app.schemas.lockin import TaskOut, TaskCreate, TaskUpdate, SavedTaskOut, SavedTaskCreate, SavedTaskUpdate
-from app.api.deps import get_db, get_current_user
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud.lockin import (
+    TaskIdConflict,
+    apply_task_batch,
+    create_saved_task as create_saved_task_row,
+    create_task as create_task_row,
+    delete_saved_task_by_id as delete_saved_task_row,
+    delete_task as delete_task_row,
+    get_changes,
+    get_saved_tasks_by_user,
+    get_tasks_by_user,
+    stream_tasks,
+    update_saved_task_by_id,
+    update_task as update_task_row,
+)
+from app.schemas.lockin import TaskOut, TaskCreate, TaskUpdate, SavedTaskOut, SavedTaskCreate, SavedTaskUpdate, TaskBatchRequest, TaskBatchResponse, ChangesResponse
+from app.api.deps import get_db, get_current_user, check_etag
+from app.db.session import AsyncSessionLocal
+from app.services.data_version import bump_data_version
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.serialization import accepts_gzip, gzip_chunks, ndjson_lines, rows_response
+from typing import List, Optional
 from pydantic import BaseModel
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+MAX_CHANGES_PAGE_SIZE = 1000
+
 class DeleteResponse(BaseModel):
     message: str
     taskidbyfrontend: int
@@ -14,82 +38,160 @@ class DeleteResponse(BaseModel):
 router = APIRouter()
 
 @router.post("/tasks", response_model=TaskOut)
-def create_task(payload: TaskCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    task = Task(
-        username=current_user.username,
-        name=payload.name,
-        estimated_time=payload.estimated_time,
-        completion_time=payload.completion_time,
-        completed=payload.completed,
-        taskidbyfrontend=payload.taskidbyfrontend,
-    )
+async def create_task(payload: TaskCreate, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
     try:
-        db.add(task)
-        db.commit()
-        db.refresh(task)
+        task = await create_task_row(db, current_user.username, payload.dict())
+        if task is None:
+            raise HTTPException(status_code=400, detail="Task already exists")
+        await db.commit()
+        await bump_data_version(current_user.id)
         return task
-    except Exception as e:
-        db.rollback()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/tasks/batch", response_model=TaskBatchResponse)
+async def batch_tasks(payload: TaskBatchRequest, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    ids = [op.taskidbyfrontend for op in payload.operations]
+    if len(ids) != len(set(ids)):
+        raise HTTPException(status_code=400, detail="Each taskidbyfrontend may appear only once per batch")
+    try:
+        results = await apply_task_batch(db, current_user.username, payload.operations)
+        await db.commit()
+        await bump_data_version(current_user.id)
+    except SQLAlchemyError as e:
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
+    return {"results": results}
+
+@router.get("/tasks", response_model=List[TaskOut], dependencies=[Depends(check_etag)])
+async def get_tasks(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    completed: Optional[bool] = None,
+    created_since: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    completed_since: Optional[datetime] = None,
+    completed_before: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    # Pages are ordered by (created_at, taskid); the next page's cursor is
+    # returned in the X-Next-Cursor header and omitted on the last page.
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    tasks = await get_tasks_by_user(
+        db,
+        current_user.username,
+        after=after,
+        limit=limit + 1,
+        completed=completed,
+        created_since=created_since,
+        created_before=created_before,
+        completed_since=completed_since,
+        completed_before=completed_before,
+    )
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(tasks[-1].created_at, tasks[-1].taskid)
+    return rows_response(tasks, response)
 
-@router.get("/tasks", response_model=List[TaskOut])
-def get_tasks(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    tasks = db.query(Task).filter(Task.username == current_user.username).all()
-    return tasks
+async def _close_export(db: AsyncSession, batches):
+    await batches.aclose()
+    await db.close()
+
+async def _export_chunks(db: AsyncSession, first: list, batches):
+    try:
+        yield ndjson_lines(first)
+        async for rows in batches:
+            yield ndjson_lines(rows)
+    finally:
+        await _close_export(db, batches)
+
+@router.get("/tasks/export")
+async def export_tasks(request: Request, include_deleted: bool = False, current_user=Depends(get_current_user)):
+    """All of the user's tasks as NDJSON (one TaskChange object per line), streamed
+    as they are read; gzip-compressed when the client accepts it."""
+    # Not get_db: its session is closed as soon as the endpoint returns, but
+    # a StreamingResponse reads the body after that, so the session has to
+    # outlive the request handler. The rows are one consistent snapshot.
+    db = AsyncSessionLocal()
+    batches = stream_tasks(db, current_user.username, include_deleted=include_deleted)
+    try:
+        # Run the query before any headers go out, so a failure is still a 500
+        first = await anext(batches, [])
+    except BaseException:
+        await _close_export(db, batches)
+        raise
+    chunks = _export_chunks(db, first, batches)
+    headers = {"Content-Disposition": 'attachment; filename="tasks.ndjson"', "Vary": "Accept-Encoding"}
+    if accepts_gzip(request.headers.get("accept-encoding")):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    # The background task closes the session if the client leaves before the
+    # body is read
+    return StreamingResponse(
+        chunks, media_type="application/x-ndjson", headers=headers, background=BackgroundTask(_close_export, db, batches)
+    )
 
 @router.put("/tasks/{taskidbyfrontend}", response_model=TaskOut)
-def update_task(taskidbyfrontend: int, payload: TaskUpdate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    task = db.query(Task).filter(Task.taskidbyfrontend == taskidbyfrontend, Task.username == current_user.username).first()
-    if not task:
+async def update_task(taskidbyfrontend: int, payload: TaskUpdate, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    try:
+        task = await update_task_row(db, current_user.username, taskidbyfrontend, payload.dict(exclude_unset=True))
+    except TaskIdConflict:
+        raise HTTPException(status_code=409, detail="Another task already uses that taskidbyfrontend")
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    for field, value in payload.dict(exclude_unset=True).items():
-        setattr(task, field, value)
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await bump_data_version(current_user.id)
     return task
 
 @router.delete("/tasks/{taskidbyfrontend}", response_model=DeleteResponse)
-def delete_task(taskidbyfrontend: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    task = db.query(Task).filter(Task.taskidbyfrontend == taskidbyfrontend, Task.username == current_user.username).first()
-    if not task:
+async def delete_task(taskidbyfrontend: int, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    if not await delete_task_row(db, current_user.username, taskidbyfrontend):
         raise HTTPException(status_code=404, detail="Task not found")
-    db.delete(task)
-    db.commit()
+    await db.commit()
+    await bump_data_version(current_user.id)
     return DeleteResponse(message="Task deleted successfully", taskidbyfrontend=taskidbyfrontend)
 
 @router.post("/saved-tasks", response_model=SavedTaskOut)
-def create_saved_task(payload: SavedTaskCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    task = SavedTask(
-        username=current_user.username,
-        name=payload.name,
-        estimated_time=payload.estimated_time,
-    )
-    db.add(task)
-    db.commit()
-    db.refresh(task)
+async def create_saved_task(payload: SavedTaskCreate, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    task = await create_saved_task_row(db, current_user.username, payload.name, payload.estimated_time)
+    await db.commit()
+    await bump_data_version(current_user.id)
     return task
 
-@router.get("/saved-tasks", response_model=List[SavedTaskOut])
-def get_saved_tasks(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    tasks = db.query(SavedTask).filter(SavedTask.username == current_user.username).all()
-    return tasks
+@router.get("/saved-tasks", response_model=List[SavedTaskOut], dependencies=[Depends(check_etag)])
+async def get_saved_tasks(response: Response, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    return rows_response(await get_saved_tasks_by_user(db, current_user.username), response)
 
 @router.put("/saved-tasks/{id}", response_model=SavedTaskOut)
-def update_saved_task(id: int, payload: SavedTaskUpdate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    task = db.query(SavedTask).filter(SavedTask.id == id, SavedTask.username == current_user.username).first()
-    if not task:
+async def update_saved_task(id: int, payload: SavedTaskUpdate, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    task = await update_saved_task_by_id(db, current_user.username, id, payload.dict(exclude_unset=True))
+    if task is None:
         raise HTTPException(status_code=404, detail="SavedTask not found")
-    for field, value in payload.dict(exclude_unset=True).items():
-        setattr(task, field, value)
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await bump_data_version(current_user.id)
     return task
 
 @router.delete("/saved-tasks/{id}", response_model=BaseModel)
-def delete_saved_task_by_id(id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    task = db.query(SavedTask).filter(SavedTask.id == id, SavedTask.username == current_user.username).first()
-    if not task:
+async def delete_saved_task_by_id(id: int, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    if not await delete_saved_task_row(db, current_user.username, id):
         raise HTTPException(status_code=404, detail="SavedTask not found")
-    db.delete(task)
-    db.commit()
-    return {"message": "Saved task deleted successfully", "id": id}
\ No newline at end of file
+    await db.commit()
+    await bump_data_version(current_user.id)
+    return {"message": "Saved task deleted successfully", "id": id}
+
+@router.get("/changes", response_model=ChangesResponse)
+async def get_lockin_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(MAX_CHANGES_PAGE_SIZE, ge=1, le=MAX_CHANGES_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    # Rows with deleted_at set are tombstones; clients drop them locally.
+    # Pass next_cursor back as ?since= and repeat while has_more is true.
+    return await get_changes(db, current_user.username, since, limit)
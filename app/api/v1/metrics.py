@@ -0,0 +1,19 @@
+import secrets
+
+from fastapi import APIRouter, Header, HTTPException, Response
+
+from app.core.config import settings
+from app.core.metrics import render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics(authorization: str | None = Header(default=None)):
+    """Prometheus scrape endpoint; requires `Authorization: Bearer <METRICS_TOKEN>`, and is off without one."""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(authorization or "", f"Bearer {settings.METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
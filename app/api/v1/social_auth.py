@@ -1,19 +1,19 @@
-from fastapi import APIRouter, Response, Depends, HTTPException
+from fastapi import APIRouter, Response, Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from urllib.parse import urlencode
-import httpx
+import asyncio
 import secrets
+from jose import JWTError
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
-from app.core.security import (
-    create_access_token,
-    create_refresh_token,
-    get_password_hash,
-)
+from app.core.security import get_password_hash
 from app.db.models.user import User
 from app.crud.user import get_user_by_email
 from app.api.deps import get_db
+from app.services.google_oidc import get_token_endpoint, verify_id_token
+from app.services.http import get_http_client
+from app.services.sessions import start_session
 
 router = APIRouter()
 
@@ -33,11 +33,14 @@ async def auth_google():
     return RedirectResponse(url, status_code=302)
 
 @router.get("/auth/callback/google")
-async def callback_google(code: str, db: Session = Depends(get_db)):
-    token_url = "https://oauth2.googleapis.com/token"
+async def callback_google(code: str, request: Request, db: AsyncSession = Depends(get_db)):
+    import httpx  # loaded with the OAuth client, see app.services.http
+
     redirect_uri = f"{settings.BACKEND_URL}/api/auth/callback/google"
 
-    async with httpx.AsyncClient() as client:
+    client = get_http_client()
+    try:
+        token_url = await get_token_endpoint()
         token_resp = await client.post(token_url, data={
             "code": code,
             "client_id": settings.GOOGLE_CLIENT_ID,
@@ -48,36 +51,41 @@ async def callback_google(code: str, db: Session = Depends(get_db)):
 
         tokens = token_resp.json()
         access_token = tokens.get("access_token")
-        if not access_token:
+        id_token = tokens.get("id_token")
+        if not access_token or not id_token:
             raise HTTPException(400, detail="Google token exchange failed")
 
-        userinfo_resp = await client.get(
-            "https://openidconnect.googleapis.com/v1/userinfo",
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
-        userinfo = userinfo_resp.json()
+        # Validated locally against Google's cached signing keys instead of
+        # calling the userinfo endpoint
+        claims = await verify_id_token(id_token, access_token=access_token)
+    except httpx.HTTPError:
+        raise HTTPException(502, detail="Google sign-in is unavailable, please retry")
+    except JWTError:
+        raise HTTPException(400, detail="Invalid Google ID token")
+
+    if not claims.get("email") or not claims.get("email_verified"):
+        raise HTTPException(400, detail="Could not retrieve a verified email from Google")
 
-    email = userinfo["email"]
+    email = claims["email"]
     username = email.split("@")[0]
 
-    user = get_user_by_email(db, email)
+    user = await get_user_by_email(db, email)
     if not user:
         user = User(
             email=email,
             username=username,
-            hashed_password=get_password_hash(secrets.token_urlsafe(16)),
+            hashed_password=await get_password_hash(secrets.token_urlsafe(16)),
             timezone="UTC",
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
 
-    jwt_token = create_access_token({"sub": user.email})
-    refresh_token = create_refresh_token({"sub": user.email})
+    tokens = await start_session(user, request, "google")
 
     redirect_url = (
         f"{settings.FRONTEND_URL}/auth/user/callback"
-        f"?access_token={jwt_token}&refresh_token={refresh_token}"
+        f"?access_token={tokens['access_token']}&refresh_token={tokens['refresh_token']}"
     )
     return RedirectResponse(url=redirect_url, status_code=302)
 
@@ -94,11 +102,14 @@ async def auth_github():
     return RedirectResponse(url, status_code=302)
 
 @router.get("/auth/callback/github")
-async def callback_github(code: str, db: Session = Depends(get_db)):
+async def callback_github(code: str, request: Request, db: AsyncSession = Depends(get_db)):
+    import httpx  # loaded with the OAuth client, see app.services.http
+
     token_url = "https://github.com/login/oauth/access_token"
     headers = {"Accept": "application/json"}
 
-    async with httpx.AsyncClient() as client:
+    client = get_http_client()
+    try:
         token_resp = await client.post(token_url, headers=headers, data={
             "code": code,
             "client_id": settings.GITHUB_CLIENT_ID,
@@ -110,41 +121,38 @@ async def callback_github(code: str, db: Session = Depends(get_db)):
         if not access_token:
             raise HTTPException(400, detail="GitHub token exchange failed")
 
-        user_resp = await client.get(
-            "https://api.github.com/user",
-            headers={"Authorization": f"Bearer {access_token}"}
+        auth_headers = {"Authorization": f"Bearer {access_token}"}
+        user_resp, email_resp = await asyncio.gather(
+            client.get("https://api.github.com/user", headers=auth_headers),
+            client.get("https://api.github.com/user/emails", headers=auth_headers),
         )
         userinfo = user_resp.json()
-
-        email_resp = await client.get(
-            "https://api.github.com/user/emails",
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
         emails = email_resp.json()
         email = next((e["email"] for e in emails if e.get("primary") and e.get("verified")), None)
+    except httpx.HTTPError:
+        raise HTTPException(502, detail="GitHub sign-in is unavailable, please retry")
 
     if not email:
         raise HTTPException(400, detail="Could not retrieve a verified email from GitHub")
 
     username = userinfo["login"]
 
-    user = get_user_by_email(db, email)
+    user = await get_user_by_email(db, email)
     if not user:
         user = User(
             email=email,
             username=username,
-            hashed_password=get_password_hash(secrets.token_urlsafe(16)),
+            hashed_password=await get_password_hash(secrets.token_urlsafe(16)),
             timezone="UTC",
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
 
-    jwt_token = create_access_token({"sub": user.email})
-    refresh_token = create_refresh_token({"sub": user.email})
+    tokens = await start_session(user, request, "github")
 
     redirect_url = (
         f"{settings.FRONTEND_URL}/auth/user/callback"
-        f"?access_token={jwt_token}&refresh_token={refresh_token}"
+        f"?access_token={tokens['access_token']}&refresh_token={tokens['refresh_token']}"
     )
     return RedirectResponse(url=redirect_url, status_code=302)
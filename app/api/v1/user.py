@@ -1,26 +1,56 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Path
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user, get_db
-from app.schemas.user import UserOut, UserUpdate
+from app.api.deps import get_current_user, get_db, get_token_payload, check_etag
+from app.crud.user import update_user
+from app.schemas.user import SessionOut, UserOut, UserUpdate
 from app.db.models.user import User
+from app.services.data_version import bump_data_version
+from app.services.principal_cache import invalidate_principal
+from app.services.sessions import has_session, list_sessions, revoke_session
 
 router = APIRouter()
 
+# Session ids are uuid4().hex
+SID_PATTERN = r"^[0-9a-f]{32}$"
 
-@router.get("/me", response_model=UserOut)
-def get_user_me(current_user: User = Depends(get_current_user)):
+
+@router.get("/me", response_model=UserOut, dependencies=[Depends(check_etag)])
+async def get_user_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 
 @router.put("/me", response_model=UserOut)
-def update_user_me(
+async def update_user_me(
     payload: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    for field, value in payload.dict(exclude_unset=True).items():
-        setattr(current_user, field, value)
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+    old_email = current_user.email
+    user = await update_user(db, current_user.id, payload.dict(exclude_unset=True))
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    await db.commit()
+    await bump_data_version(current_user.id)
+    await invalidate_principal(old_email)
+    if user["email"] != old_email:
+        await invalidate_principal(user["email"])
+    return user
+
+
+@router.get("/sessions", response_model=list[SessionOut])
+async def get_user_sessions(
+    payload: dict = Depends(get_token_payload),
+    current_user: User = Depends(get_current_user),
+):
+    sessions = await list_sessions(current_user.id)
+    for session in sessions:
+        session["current"] = session["sid"] == payload.get("sid")
+    return sessions
+
+
+@router.delete("/sessions/{sid}", status_code=204)
+async def delete_user_session(sid: str = Path(pattern=SID_PATTERN), current_user: User = Depends(get_current_user)):
+    if not await has_session(current_user.id, sid):
+        raise HTTPException(status_code=404, detail="Session not found")
+    await revoke_session(current_user.id, sid)
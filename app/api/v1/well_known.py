@@ -0,0 +1,21 @@
+import hashlib
+import json
+
+from fastapi import APIRouter, Request, Response
+
+from app.core.config import settings
+from app.core.jwt_keys import get_keyring
+
+router = APIRouter()
+
+
+@router.get("/jwks.json")
+def jwks(request: Request):
+    """Public keys for verifying our tokens locally; cache for JWKS_MAX_AGE_SECONDS."""
+    keyring = get_keyring()
+    body = json.dumps(keyring.jwks() if keyring is not None else {"keys": []}, separators=(",", ":"))
+    etag = '"' + hashlib.blake2b(body.encode(), digest_size=8).hexdigest() + '"'
+    headers = {"Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}", "ETag": etag}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
@@ -1,26 +1,77 @@
+from datetime import datetime
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: str | None = None
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
+    JWT_KEYS_FILE: str | None = None
+    JWT_LEGACY_HS256_UNTIL: datetime | None = None
+    JWKS_MAX_AGE_SECONDS: int = 3600
+
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_SLOW_CHECKOUT_SECONDS: float = 0.25
+    SLOW_QUERY_SECONDS: float = 0.2
+    N_PLUS_ONE_THRESHOLD: int = 10
+    SQL_DEBUG_HEADERS: bool = False
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_DAYS: int
 
+    STARTUP_MAX_ATTEMPTS: int = 8
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2
+    READINESS_CACHE_SECONDS: float = 5
+
+    HASH_POOL_WORKERS: int = 2
+    HASH_QUEUE_DEPTH: int = 32
+    HASH_RETRY_AFTER_SECONDS: int = 2
+
     SMTP_USER: str
     SMTP_PASSWORD: str
     SMTP_HOST: str
     SMTP_PORT: int
+    SMTP_STARTTLS: bool = True
+    SMTP_TIMEOUT_SECONDS: int = 30
+
+    EMAIL_WORKER_CONCURRENCY: int = 2
+    EMAIL_BATCH_SIZE: int = 50
+    EMAIL_MAX_ATTEMPTS: int = 6
 
     REDIS_HOST: str
     REDIS_PORT: int
     REDIS_PASSWORD: str
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 5
+
+    OTP_TTL_SECONDS: int = 600
+    OTP_MAX_ATTEMPTS: int = 5
+
+    RATE_LIMIT_ENABLED: bool = True
+
+    METRICS_TOKEN: str | None = None
+    EMAIL_WORKER_METRICS_PORT: int = 0
+
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    REVOCATION_BLOOM_CAPACITY: int = 100000
 
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
+    GOOGLE_DISCOVERY_URL: str = "https://accounts.google.com/.well-known/openid-configuration"
     GITHUB_CLIENT_ID: str
     GITHUB_CLIENT_SECRET: str
 
+    OAUTH_HTTP2: bool = True
+    OAUTH_TIMEOUT_SECONDS: float = 10
+    OAUTH_CONNECT_TIMEOUT_SECONDS: float = 3
+    OAUTH_MAX_CONNECTIONS: int = 20
+
     FRONTEND_URL: str
     BACKEND_URL: str
 
@@ -29,4 +80,20 @@ class Settings(BaseSettings):
         from_attributes=True      
     )
 
-settings = Settings()
\ No newline at end of file
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+class _LazySettings:
+    """Stands in for the Settings instance, which is only built (reading the
+    environment and .env) the first time an attribute is used."""
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_settings(), name, value)
+
+
+settings = _LazySettings()
@@ -0,0 +1,12 @@
+# Kept free of app imports: this module is loaded by the hashing worker processes.
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+
+
+def hash_password(password):
+    return pwd_context.hash(password)
+
+
+def check_password(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
@@ -0,0 +1,165 @@
+"""Prometheus metrics for the API and the email worker.
+
+Under several worker processes (uvicorn --workers, gunicorn), set
+PROMETHEUS_MULTIPROC_DIR to an empty directory before starting; each process
+then writes its samples there and render_metrics() aggregates them, so any
+worker can answer a scrape for all of them.
+"""
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template and status code",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being handled",
+    multiprocess_mode="livesum",
+)
+
+PRINCIPAL_CACHE_HITS = Counter(
+    "principal_cache_hits_total",
+    "Authenticated requests whose user was served from the in-process principal cache",
+)
+PRINCIPAL_CACHE_MISSES = Counter(
+    "principal_cache_misses_total",
+    "Authenticated requests whose user had to be loaded from the database",
+)
+
+TOKEN_CACHE_HITS = Counter(
+    "token_cache_hits_total",
+    "Bearer tokens whose verified claims were served from the in-process cache",
+)
+TOKEN_CACHE_MISSES = Counter(
+    "token_cache_misses_total",
+    "Bearer tokens that had to be verified with jwt.decode",
+)
+
+PASSWORD_HASHING_SECONDS = Histogram(
+    "password_hashing_seconds",
+    "Time to hash or verify a password, including time queued for the hashing pool",
+    ["op"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+PASSWORD_HASHING_IN_FLIGHT = Gauge(
+    "password_hashing_in_flight",
+    "Password hash/verify operations running or queued in the hashing pool",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASHING_REJECTED = Counter(
+    "password_hashing_rejected_total",
+    "Password hash/verify operations rejected because the hashing queue was full",
+    ["op"],
+)
+
+RATE_LIMIT_REJECTED = Counter(
+    "rate_limit_rejected_total",
+    "Requests rejected with 429 by the sliding-window rate limiter",
+    ["scope"],
+)
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a free connection in the database pool (opening new ones is db_pool_connect_seconds)",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_CONNECT_SECONDS = Histogram(
+    "db_pool_connect_seconds",
+    "Time to open a new database connection for the pool",
+    ["engine"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT_SECONDS",
+    ["engine"],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Database connections currently checked out of the pool",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connections open beyond DB_POOL_SIZE (up to DB_MAX_OVERFLOW)",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTION_AGE_SECONDS = Histogram(
+    "db_pool_connection_age_seconds",
+    "Age of pooled connections when they are checked out",
+    ["engine"],
+    buckets=(1, 10, 60, 300, 900, 1800, 3600, 7200),
+)
+
+DB_QUERIES = Counter(
+    "db_queries_total",
+    "SQL statements executed",
+    ["engine"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds",
+    "Time per SQL statement, from sending it to having the cursor ready",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+REDIS_COMMANDS = Counter(
+    "redis_commands_total",
+    "Redis commands sent, including those inside pipelines",
+    ["command"],
+)
+REDIS_ROUND_TRIP_SECONDS = Histogram(
+    "redis_round_trip_seconds",
+    "Time per Redis call; a pipeline counts as one call labelled PIPELINE",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+EMAILS_QUEUED = Counter(
+    "emails_queued_total",
+    "Emails added to the outbox stream",
+)
+SMTP_SENDS = Counter(
+    "smtp_sends_total",
+    "Delivery attempts by the email worker",
+    ["outcome"],
+)
+SMTP_SEND_SECONDS = Histogram(
+    "smtp_send_seconds",
+    "Time to deliver one email, including reconnecting",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+OAUTH_REQUESTS = Counter(
+    "oauth_requests_total",
+    "Outbound requests to OAuth providers",
+    ["host", "status"],
+)
+OAUTH_REQUEST_SECONDS = Histogram(
+    "oauth_request_seconds",
+    "Time until response headers from an OAuth provider",
+    ["host"],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+def render_metrics():
+    """Body and content type for a scrape of this process, or of all of them in multiprocess mode."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """Drop this process's live gauges from the shared directory on shutdown."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
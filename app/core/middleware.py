@@ -0,0 +1,81 @@
+import time
+
+from starlette.middleware.sessions import SessionMiddleware
+
+from app.core.config import settings
+from app.core.metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS_IN_FLIGHT
+from app.db.instrumentation import report_request, track_queries
+
+
+class LazySessionMiddleware(SessionMiddleware):
+    """SessionMiddleware that reads SECRET_KEY when the middleware stack is
+    built (first request or lifespan) rather than when app.main is imported."""
+
+    def __init__(self, app, **kwargs):
+        super().__init__(app, secret_key=settings.SECRET_KEY, **kwargs)
+
+
+class PrometheusMiddleware:
+    """Records request latency by route template (e.g. /lockin/tasks/{task_id})
+    and status code. Plain ASGI, so streamed responses are timed to the last
+    byte and nothing is buffered."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope; unmatched
+            # paths share one label so scanners can't blow up cardinality
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - start)
+
+
+class QueryStatsMiddleware:
+    """Collects SQL statement counts and time for each request, warns about
+    repeated statements (N+1) and, with SQL_DEBUG_HEADERS, reports the totals
+    as of when the response headers are sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start" and settings.SQL_DEBUG_HEADERS:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-db-query-count", str(stats.count).encode()),
+                        (b"x-db-query-time-ms", f"{stats.seconds * 1000:.1f}".encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                report_request(stats, scope["method"], getattr(route, "path", scope["path"]))
@@ -1,42 +1,206 @@
-from passlib.context import CryptContext
+import asyncio
+import hashlib
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from jose import JWTError, jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from app.core.config import settings
+from app.core.hashing import check_password, hash_password
+from app.core.jwt_keys import ALGORITHM as JWT_KEYS_ALGORITHM, get_keyring, legacy_hs256_until
+from app.core.metrics import (
+    PASSWORD_HASHING_IN_FLIGHT,
+    PASSWORD_HASHING_REJECTED,
+    PASSWORD_HASHING_SECONDS,
+    TOKEN_CACHE_HITS,
+    TOKEN_CACHE_MISSES,
+)
 from fastapi import HTTPException
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# argon2 is CPU-bound and deliberately slow, so it runs in a dedicated process
+# pool instead of the request threadpool. At most HASH_POOL_WORKERS +
+# HASH_QUEUE_DEPTH operations are admitted per app worker; the rest get a 503.
+_hash_pool = None
+_hash_in_flight = 0
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
 
+def start_hash_pool():
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=settings.HASH_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _hash_pool
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+
+def shutdown_hash_pool():
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
+
+async def _run_hashing(op, fn, *args):
+    global _hash_in_flight, _hash_pool
+    if _hash_in_flight >= settings.HASH_POOL_WORKERS + settings.HASH_QUEUE_DEPTH:
+        PASSWORD_HASHING_REJECTED.labels(op).inc()
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry",
+            headers={"Retry-After": str(settings.HASH_RETRY_AFTER_SECONDS)},
+        )
+    _hash_in_flight += 1
+    PASSWORD_HASHING_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(start_hash_pool(), fn, *args)
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool for the next request
+        _hash_pool = None
+        raise
+    finally:
+        _hash_in_flight -= 1
+        PASSWORD_HASHING_IN_FLIGHT.dec()
+        PASSWORD_HASHING_SECONDS.labels(op).observe(time.perf_counter() - start)
+
+
+async def verify_password(plain_password, hashed_password):
+    return await _run_hashing("verify", check_password, plain_password, hashed_password)
+
+
+async def get_password_hash(password):
+    return await _run_hashing("hash", hash_password, password)
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified JWT claims, keyed by a hash of the token.
+
+    An entry is only served until the token's own ``exp``, so a cache hit is
+    never more permissive than decoding again. Tokens without ``exp`` and
+    tokens that fail verification are not cached.
+    """
+
+    def __init__(self, maxsize: int = None):
+        self._maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self) -> int:
+        return settings.TOKEN_CACHE_MAX_SIZE if self._maxsize is None else self._maxsize
+
+    def get(self, key: bytes):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: bytes, claims: dict, until: float = None):
+        exp = claims.get("exp")
+        if self.maxsize <= 0 or not isinstance(exp, (int, float)):
+            return
+        if until is not None:
+            exp = min(exp, until)
+        with self._lock:
+            self._data[key] = (exp, claims)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+verified_tokens = VerifiedTokenCache()
+
+
+def decode_token(token: str) -> dict:
+    """Verify a bearer token and return its claims; raises JWTError if invalid.
+
+    Every verifier should go through here so repeat tokens skip jwt.decode.
+    """
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    claims = verified_tokens.get(key)
+    if claims is not None:
+        TOKEN_CACHE_HITS.inc()
+        return dict(claims)
+    TOKEN_CACHE_MISSES.inc()
+    claims, valid_until = _verify(token)
+    verified_tokens.set(key, claims, valid_until)
+    return dict(claims)
+
+
+def _sign(claims: dict) -> str:
+    keyring = get_keyring()
+    if keyring is None:
+        return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    key = keyring.signing_key()
+    return jwt.encode(claims, key.private_key, algorithm=JWT_KEYS_ALGORITHM, headers={"kid": key.kid})
+
+
+def _verify(token: str):
+    """Check a token's signature and claims; returns (claims, latest time it may be trusted or None)."""
+    header = jwt.get_unverified_header(token)
+    if header.get("alg") == JWT_KEYS_ALGORITHM:
+        keyring = get_keyring()
+        key = keyring.verification_key(header.get("kid")) if keyring is not None else None
+        if key is None:
+            raise JWTError("Unknown signing key")
+        return jwt.decode(token, key.public_key, algorithms=[JWT_KEYS_ALGORITHM]), None
+    # Tokens issued before the switch to asymmetric keys, during the transition window
+    until = legacy_hs256_until()
+    if until is not None and datetime.now(timezone.utc) >= until:
+        raise JWTError("HS256 tokens are no longer accepted")
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    return claims, until.timestamp() if until is not None else None
+
+
+def access_token_lifetime() -> timedelta:
+    return timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
+def refresh_token_lifetime() -> timedelta:
+    return timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
 
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(days=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode = {"type": "access", "jti": uuid.uuid4().hex, **data}
+    expire = datetime.utcnow() + (expires_delta or access_token_lifetime())
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    return _sign(to_encode)
 
 
 def create_refresh_token(data: dict, expires_delta: timedelta = None):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS))
+    to_encode = {"type": "refresh", "jti": uuid.uuid4().hex, **data}
+    expire = datetime.utcnow() + (expires_delta or refresh_token_lifetime())
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    return _sign(to_encode)
 
 def create_password_reset_token(email: str):
     delta = timedelta(hours=1)
     now = datetime.utcnow()
     expires = now + delta
-    data = {"exp": expires, "nbf": now, "sub": email}
-    return jwt.encode(data, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    data = {"exp": expires, "nbf": now, "sub": email, "type": "reset"}
+    return _sign(data)
 
 def verify_password_reset_token(token: str) -> str:
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload, _ = _verify(token)
+        # Tokens from before the type claim carry nbf, which access tokens never did
+        if payload.get("type", "reset" if "nbf" in payload else None) != "reset":
+            raise JWTError("Not a password reset token")
         return payload["sub"]
     except JWTError:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
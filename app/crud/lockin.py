@@ -1,5 +1,10 @@
-from sqlalchemy.orm import Session
-from app.db.models.lockin import Task, SavedTask
+from datetime import datetime
+from sqlalchemy import case, func, literal_column, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.lockin import Task, SavedTask, current_revision
+from app.schemas.lockin import SavedTaskOut, TaskChange, TaskOut
 from typing import List, Optional
 
 # Helper to get model columns (excluding PKs)
@@ -10,32 +15,269 @@ def _get_updatable_fields(model, exclude: set = None):
         if not c.primary_key and c.name not in exclude
     }
 
-def get_tasks_by_user(db: Session, username: str) -> List[Task]:
-    return db.query(Task).filter(Task.username == username).all()
-
-def update_task_by_id(db: Session, username: str, taskid: int, data: dict) -> Optional[Task]:
-    task = db.query(Task).filter(Task.taskid == taskid, Task.username == username).first()
-    if not task:
-        return None
-    allowed_fields = _get_updatable_fields(Task, exclude={"username", "created_at"})
-    for field, value in data.items():
-        if field in allowed_fields:
-            setattr(task, field, value)
-    db.commit()
-    db.refresh(task)
-    return task
-
-def get_saved_tasks_by_user(db: Session, username: str) -> List[SavedTask]:
-    return db.query(SavedTask).filter(SavedTask.username == username).all()
-
-def update_saved_task_by_id(db: Session, username: str, id: int, data: dict) -> Optional[SavedTask]:
-    task = db.query(SavedTask).filter(SavedTask.id == id, SavedTask.username == username).first()
-    if not task:
-        return None
-    allowed_fields = _get_updatable_fields(SavedTask, exclude={"username"})
-    for field, value in data.items():
-        if field in allowed_fields:
-            setattr(task, field, value)
-    db.commit()
-    db.refresh(task)
-    return task
+# Bookkeeping columns maintained by the database, never set from payloads
+_SYNC_COLUMNS = {"updated_at", "deleted_at", "revision"}
+
+# Batch operation fields that have defaults, so a client may leave them out
+_BATCH_OPTIONAL_FIELDS = ("completion_time", "completed")
+
+# List endpoints select just the columns their response schema has, as plain
+# rows, instead of loading ORM objects
+TASK_OUT_COLUMNS = tuple(Task.__table__.c[name] for name in TaskOut.model_fields)
+SAVED_TASK_OUT_COLUMNS = tuple(SavedTask.__table__.c[name] for name in SavedTaskOut.model_fields)
+TASK_EXPORT_COLUMNS = tuple(Task.__table__.c[name] for name in TaskChange.model_fields)
+
+async def get_tasks_by_user(
+    db: AsyncSession,
+    username: str,
+    *,
+    after: Optional[tuple[datetime, int]] = None,
+    limit: Optional[int] = None,
+    completed: Optional[bool] = None,
+    created_since: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    completed_since: Optional[datetime] = None,
+    completed_before: Optional[datetime] = None,
+    columns: tuple = TASK_OUT_COLUMNS,
+) -> list:
+    """Rows of ``columns`` for tasks in (created_at, taskid) order, starting after the ``after`` key."""
+    query = select(*columns).where(Task.username == username, Task.deleted_at.is_(None))
+    if after is not None:
+        query = query.where(tuple_(Task.created_at, Task.taskid) > tuple_(*after))
+    if completed is not None:
+        query = query.where(Task.completed == completed)
+    if created_since is not None:
+        query = query.where(Task.created_at >= created_since)
+    if created_before is not None:
+        query = query.where(Task.created_at < created_before)
+    if completed_since is not None:
+        query = query.where(Task.completion_time >= completed_since)
+    if completed_before is not None:
+        query = query.where(Task.completion_time < completed_before)
+    query = query.order_by(Task.created_at, Task.taskid)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return result.all()
+
+async def _update_returning(db: AsyncSession, model, where: list, data: dict, allowed_fields: set):
+    """UPDATE ... RETURNING * of one live row; None if no row matched.
+
+    updated_at and revision are bumped by their column onupdate defaults. An
+    update with no allowed fields only reads the row, so it does not show up
+    in the change feed.
+    """
+    table = model.__table__
+    values = {field: value for field, value in data.items() if field in allowed_fields}
+    where = [*where, table.c.deleted_at.is_(None)]
+    if values:
+        stmt = update(table).where(*where).values(**values).returning(*table.c)
+    else:
+        stmt = select(*table.c).where(*where)
+    return (await db.execute(stmt)).mappings().first()
+
+async def _soft_delete_returning(db: AsyncSession, model, where: list, key):
+    """Tombstone one live row in a single UPDATE; returns its key, or None if no row matched."""
+    table = model.__table__
+    stmt = update(table).where(*where, table.c.deleted_at.is_(None)).values(deleted_at=func.now()).returning(key)
+    return (await db.execute(stmt)).scalar()
+
+_TASK_FIELDS = _get_updatable_fields(Task, exclude={"username", "created_at"} | _SYNC_COLUMNS)
+_SAVED_TASK_FIELDS = _get_updatable_fields(SavedTask, exclude={"username"} | _SYNC_COLUMNS)
+
+async def stream_tasks(db: AsyncSession, username: str, *, include_deleted: bool = False, batch_size: int = 1000):
+    """Yield all of a user's tasks in (created_at, taskid) order, ``batch_size`` rows at a time.
+
+    The rows come from a server-side cursor, so only one batch is held in
+    memory however many tasks the user has.
+    """
+    query = select(*TASK_EXPORT_COLUMNS).where(Task.username == username)
+    if not include_deleted:
+        query = query.where(Task.deleted_at.is_(None))
+    query = query.order_by(Task.created_at, Task.taskid).execution_options(yield_per=batch_size)
+    result = await db.stream(query)
+    async for rows in result.partitions():
+        yield rows
+
+class TaskIdConflict(Exception):
+    """The new taskidbyfrontend is already used by another of the user's tasks."""
+
+async def _update_task_returning(db: AsyncSession, where: list, data: dict):
+    try:
+        return await _update_returning(db, Task, where, data, _TASK_FIELDS)
+    except IntegrityError as e:
+        await db.rollback()
+        # ix_tasks_username_taskidbyfrontend also covers tombstones, so moving
+        # onto the id of a deleted task conflicts too
+        if getattr(e.orig, "pgcode", None) == "23505":
+            raise TaskIdConflict(data.get("taskidbyfrontend")) from e
+        raise
+
+async def update_task_by_id(db: AsyncSession, username: str, taskid: int, data: dict):
+    """Raises TaskIdConflict (after rolling back) if the new taskidbyfrontend is taken."""
+    tasks = Task.__table__
+    return await _update_task_returning(db, [tasks.c.taskid == taskid, tasks.c.username == username], data)
+
+async def update_task(db: AsyncSession, username: str, taskidbyfrontend: int, data: dict):
+    """Update a live task by its frontend id; returns the updated row or None.
+
+    Raises TaskIdConflict (after rolling back) if the new taskidbyfrontend is taken.
+    """
+    tasks = Task.__table__
+    where = [tasks.c.taskidbyfrontend == taskidbyfrontend, tasks.c.username == username]
+    return await _update_task_returning(db, where, data)
+
+async def delete_task(db: AsyncSession, username: str, taskidbyfrontend: int) -> bool:
+    tasks = Task.__table__
+    where = [tasks.c.taskidbyfrontend == taskidbyfrontend, tasks.c.username == username]
+    return await _soft_delete_returning(db, Task, where, tasks.c.taskid) is not None
+
+async def apply_task_batch(db: AsyncSession, username: str, operations: list) -> List[dict]:
+    """Apply create/update/delete operations keyed by taskidbyfrontend.
+
+    Creates and updates go out as multi-row INSERT ... ON CONFLICT statements
+    (one per combination of optional fields the operations set) and deletes as
+    one UPDATE ... RETURNING that tombstones them, all in the caller's
+    transaction. An update keeps the optional fields it leaves out; reviving a
+    tombstone starts the row over like create_task does. Operations must have
+    distinct taskidbyfrontend values.
+    """
+    tasks = Task.__table__
+    outcomes = {}
+    revived = tasks.c.deleted_at.is_not(None)
+
+    groups = {}
+    for op in operations:
+        if op.op != "delete":
+            fields = tuple(name for name in _BATCH_OPTIONAL_FIELDS if name in op.model_fields_set)
+            groups.setdefault(fields, []).append(op)
+    for fields, upserts in groups.items():
+        stmt = insert(tasks).values([
+            {
+                "username": username,
+                "taskidbyfrontend": op.taskidbyfrontend,
+                "name": op.name,
+                "estimated_time": op.estimated_time,
+                **{name: getattr(op, name) for name in fields},
+            }
+            for op in upserts
+        ])
+        set_ = {name: stmt.excluded[name] for name in ("name", "estimated_time", *fields)}
+        for name in _BATCH_OPTIONAL_FIELDS:
+            if name not in fields:
+                set_[name] = case((revived, stmt.excluded[name]), else_=tasks.c[name])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tasks.c.username, tasks.c.taskidbyfrontend],
+            set_={
+                **set_,
+                "created_at": case((revived, func.now()), else_=tasks.c.created_at),
+                "deleted_at": None,
+                "updated_at": func.clock_timestamp(),
+                "revision": current_revision,
+            },
+        ).returning(*tasks.c, literal_column("xmax = 0").label("inserted"))
+        for row in (await db.execute(stmt)).mappings():
+            outcomes[row["taskidbyfrontend"]] = {
+                "taskidbyfrontend": row["taskidbyfrontend"],
+                "status": "created" if row["inserted"] else "updated",
+                "task": dict(row),
+            }
+
+    deletes = [op.taskidbyfrontend for op in operations if op.op == "delete"]
+    if deletes:
+        stmt = (
+            update(tasks)
+            .where(tasks.c.username == username, tasks.c.taskidbyfrontend.in_(deletes), tasks.c.deleted_at.is_(None))
+            .values(deleted_at=func.now())
+            .returning(tasks.c.taskidbyfrontend)
+        )
+        for taskidbyfrontend in (await db.execute(stmt)).scalars():
+            outcomes[taskidbyfrontend] = {"taskidbyfrontend": taskidbyfrontend, "status": "deleted"}
+
+    return [
+        outcomes.get(op.taskidbyfrontend, {"taskidbyfrontend": op.taskidbyfrontend, "status": "not_found"})
+        for op in operations
+    ]
+
+async def create_task(db: AsyncSession, username: str, data: dict):
+    """Insert a task, reviving a tombstone with the same taskidbyfrontend.
+
+    Returns None if a live task already uses that taskidbyfrontend.
+    """
+    tasks = Task.__table__
+    stmt = insert(tasks).values(username=username, **data)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[tasks.c.username, tasks.c.taskidbyfrontend],
+        set_={
+            **{name: stmt.excluded[name] for name in data if name != "taskidbyfrontend"},
+            "created_at": func.now(),
+            "deleted_at": None,
+            "updated_at": func.clock_timestamp(),
+            "revision": current_revision,
+        },
+        where=tasks.c.deleted_at.is_not(None),
+    ).returning(*tasks.c)
+    return (await db.execute(stmt)).mappings().first()
+
+async def _changes_between(db: AsyncSession, username: str, after: int, before: int, limit: Optional[int] = None) -> list:
+    """(revision, kind, row) for both tables with ``after < revision < before``, in revision order."""
+    changes = []
+    for model, kind in ((Task, "tasks"), (SavedTask, "saved_tasks")):
+        query = (
+            select(model)
+            .where(model.username == username, model.revision > after, model.revision < before)
+            .order_by(model.revision)
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        result = await db.execute(query)
+        changes.extend((row.revision, kind, row) for row in result.scalars())
+    changes.sort(key=lambda change: change[0])
+    return changes if limit is None else changes[:limit]
+
+async def get_changes(db: AsyncSession, username: str, since: int, limit: int) -> dict:
+    """Tasks and saved tasks (including tombstones) changed after revision ``since``.
+
+    A row's revision is the id of the transaction that last wrote it. Every
+    transaction id below the snapshot xmin belongs to a finished transaction,
+    so only rows under that bound are returned: a write still in flight gets a
+    revision at or above it and cannot commit behind ``next_cursor``. The
+    flip side is that a long-running write transaction anywhere on the server
+    holds the feed back until it ends.
+
+    Rows written by one transaction share a revision and are never split
+    across pages, so a page can run past ``limit`` to finish the last one.
+    ``next_cursor`` is the last revision returned (or ``since`` when nothing
+    changed).
+    """
+    bound = (await db.execute(select(literal_column("pg_snapshot_xmin(pg_current_snapshot())::text::bigint")))).scalar_one()
+    changes = await _changes_between(db, username, since, bound, limit + 1)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if has_more:
+        last = changes[-1][0]
+        changes = [change for change in changes if change[0] < last]
+        changes += await _changes_between(db, username, last - 1, last + 1)
+    feed = {"tasks": [], "saved_tasks": [], "next_cursor": changes[-1][0] if changes else since, "has_more": has_more}
+    for _, kind, row in changes:
+        feed[kind].append(row)
+    return feed
+
+async def get_saved_tasks_by_user(db: AsyncSession, username: str) -> list:
+    result = await db.execute(
+        select(*SAVED_TASK_OUT_COLUMNS).where(SavedTask.username == username, SavedTask.deleted_at.is_(None))
+    )
+    return result.all()
+
+async def create_saved_task(db: AsyncSession, username: str, name: str, estimated_time: int):
+    saved = SavedTask.__table__
+    stmt = insert(saved).values(username=username, name=name, estimated_time=estimated_time).returning(*saved.c)
+    return (await db.execute(stmt)).mappings().first()
+
+async def update_saved_task_by_id(db: AsyncSession, username: str, id: int, data: dict):
+    saved = SavedTask.__table__
+    return await _update_returning(db, SavedTask, [saved.c.id == id, saved.c.username == username], data, _SAVED_TASK_FIELDS)
+
+async def delete_saved_task_by_id(db: AsyncSession, username: str, id: int) -> bool:
+    saved = SavedTask.__table__
+    return await _soft_delete_returning(db, SavedTask, [saved.c.id == id, saved.c.username == username], saved.c.id) is not None
@@ -1,18 +1,44 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models.user import User
 from app.core.security import get_password_hash
 from app.schemas.user import UserCreate
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
 
-def create_user(db: Session, user: UserCreate):
-    hashed_pw = get_password_hash(user.password)
+async def create_user(db: AsyncSession, user: UserCreate):
+    hashed_pw = await get_password_hash(user.password)
     db_user = User(email=user.email, hashed_password=hashed_pw, username=user.username)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-def get_user_by_username(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+async def get_user_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
+_UPDATABLE_FIELDS = {"email", "username", "first_name", "last_name", "profile_picture_url", "location", "timezone"}
+
+def _normalize(data: dict) -> dict:
+    # Same normalization as the User model's validators, which Core statements bypass
+    values = {field: value for field, value in data.items() if field in _UPDATABLE_FIELDS}
+    for field in ("email", "username"):
+        if values.get(field) is not None:
+            values[field] = values[field].lower()
+    for field in ("first_name", "last_name"):
+        if values.get(field) is not None:
+            values[field] = values[field].title()
+    return values
+
+async def update_user(db: AsyncSession, user_id: int, data: dict):
+    """UPDATE ... RETURNING the user's row in one statement; None if the user is gone."""
+    users = User.__table__
+    values = _normalize(data)
+    if values:
+        stmt = update(users).where(users.c.id == user_id).values(**values).returning(*users.c)
+    else:
+        stmt = select(*users.c).where(users.c.id == user_id)
+    return (await db.execute(stmt)).mappings().first()
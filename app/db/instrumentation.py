@@ -0,0 +1,121 @@
+"""Per-request SQL statistics, a slow-query log and query budgets for tests.
+
+Engine event hooks time every statement and add it to the QueryStats of the
+current request (a ContextVar set by QueryStatsMiddleware; SQLAlchemy carries
+it into the greenlet that runs async queries). Statements are logged and
+compared in normalized form: literals and bind parameters become ``?``, so
+no user data reaches the logs and ``WHERE id = 1`` / ``WHERE id = 2`` count as
+the same statement when looking for N+1 patterns.
+
+Tests can pin an endpoint's query count; this fails once someone adds a
+lazy load in a loop:
+
+    with query_budget(3):
+        client.get("/lockin/tasks", headers=auth_headers)
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import DB_QUERIES, DB_QUERY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|\$\d+|%\(\w+\)s|%s")
+_VALUE_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+# SQLAlchemy reuses compiled statements, so the same few strings come back
+@lru_cache(maxsize=1024)
+def normalize_sql(statement: str) -> str:
+    statement = _LITERALS.sub("?", " ".join(statement.split()))
+    return _VALUE_LISTS.sub("(...)", statement)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> list:
+        """Normalized statements run at least threshold times, most frequent first."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+# Collectors opened by query_budget(); they see statements from every
+# context, since TestClient runs the app on another thread
+_budgets: list[QueryStats] = []
+
+
+@contextmanager
+def track_queries():
+    """Collect statistics for statements issued in this context (one request)."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    stats = QueryStats()
+    _budgets.append(stats)
+    try:
+        yield stats
+    finally:
+        _budgets.remove(stats)
+    if stats.count > max_queries:
+        statements = "\n".join(f"  {n} x {sql}" for sql, n in stats.statements.most_common())
+        raise QueryBudgetExceeded(f"{stats.count} queries, budget is {max_queries}:\n{statements}")
+
+
+def instrument_engine(engine, label: str):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started_at = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started_at
+        DB_QUERIES.labels(label).inc()
+        DB_QUERY_SECONDS.labels(label).observe(elapsed)
+        stats = _current.get()
+        slow = settings.SLOW_QUERY_SECONDS and elapsed > settings.SLOW_QUERY_SECONDS
+        if stats is None and not _budgets and not slow:
+            return
+        normalized = normalize_sql(statement)
+        if stats is not None:
+            stats.record(normalized, elapsed)
+        for budget in _budgets:
+            budget.record(normalized, elapsed)
+        if slow:
+            logger.warning("Slow query (%.3fs): %s", elapsed, normalized)
+
+
+def report_request(stats: QueryStats, method: str, route: str):
+    """Warn about likely N+1 patterns once the request is done."""
+    threshold = settings.N_PLUS_ONE_THRESHOLD
+    if not threshold:
+        return
+    for statement, n in stats.repeated(threshold):
+        logger.warning("Possible N+1 in %s %s: %d x %s", method, route, n, statement)
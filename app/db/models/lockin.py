@@ -1,6 +1,11 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, func
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Boolean, ForeignKey, Index, func, text
 from app.db.base import Base
 
+# Every insert, update and soft delete of tasks and saved_tasks stamps the
+# writing transaction's id, so "revision > cursor" finds everything changed
+# since then and the change feed can tell finished writes from in-flight ones.
+current_revision = text("pg_current_xact_id()::text::bigint")
+
 class Task(Base):
     __tablename__ = "tasks"
     taskid = Column(Integer, primary_key=True, index=True)
@@ -11,10 +16,26 @@ class Task(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     completed = Column(Boolean, default=False)
     taskidbyfrontend = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.clock_timestamp(), onupdate=func.clock_timestamp(), nullable=False)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    revision = Column(BigInteger, server_default=current_revision, onupdate=current_revision, nullable=False)
+
+    __table_args__ = (
+        Index("ix_tasks_username_taskidbyfrontend", "username", "taskidbyfrontend", unique=True),
+        Index("ix_tasks_username_created_at_taskid", "username", "created_at", "taskid"),
+        Index("ix_tasks_username_revision", "username", "revision"),
+    )
 
 class SavedTask(Base):
     __tablename__ = "saved_tasks"
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    username = Column(String, ForeignKey("users.username"), nullable=False)
+    username = Column(String, ForeignKey("users.username"), nullable=False, index=True)
     name = Column(String, nullable=False)
     estimated_time = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.clock_timestamp(), onupdate=func.clock_timestamp(), nullable=False)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    revision = Column(BigInteger, server_default=current_revision, onupdate=current_revision, nullable=False)
+
+    __table_args__ = (
+        Index("ix_saved_tasks_username_revision", "username", "revision"),
+    )
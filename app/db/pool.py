@@ -0,0 +1,102 @@
+"""Connection pools that report checkout latency, overflow and connection age.
+
+SQLAlchemy has no event for "waiting for a connection", so the pool classes
+time _do_get() (the call that blocks until a connection is free or a new one
+is opened). Opening one is timed separately in _create_connection() and left
+out of the wait; everything else comes from the regular pool events.
+"""
+import logging
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+from app.core.metrics import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_CHECKOUT_SECONDS,
+    DB_POOL_CHECKOUT_TIMEOUTS,
+    DB_POOL_CONNECT_SECONDS,
+    DB_POOL_CONNECTION_AGE_SECONDS,
+    DB_POOL_OVERFLOW,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _TimedCheckout:
+    metrics_label = "sync"
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        record = super()._create_connection()
+        elapsed = time.perf_counter() - start
+        DB_POOL_CONNECT_SECONDS.labels(self.metrics_label).observe(elapsed)
+        # Picked up by _do_get when it opened this connection itself
+        record.info["connect_seconds"] = elapsed
+        return record
+
+    def _do_get(self):
+        start = time.perf_counter()
+        connect_seconds = 0.0
+        try:
+            record = super()._do_get()
+            connect_seconds = record.info.pop("connect_seconds", 0.0)
+            return record
+        except PoolTimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.labels(self.metrics_label).inc()
+            raise
+        finally:
+            waited = time.perf_counter() - start - connect_seconds
+            DB_POOL_CHECKOUT_SECONDS.labels(self.metrics_label).observe(waited)
+            slow = settings.DB_POOL_SLOW_CHECKOUT_SECONDS
+            if slow and waited > slow:
+                logger.warning(
+                    "Slow %s DB pool checkout: %.3fs (%s); consider raising DB_POOL_SIZE/DB_MAX_OVERFLOW",
+                    self.metrics_label, waited, self.status(),
+                )
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    metrics_label = "sync"
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+
+def _report_usage(pool):
+    label = pool.metrics_label
+    DB_POOL_CHECKED_OUT.labels(label).set(pool.checkedout())
+    # overflow() counts up from -pool_size
+    DB_POOL_OVERFLOW.labels(label).set(max(0, pool.overflow()))
+
+
+def instrument_pool(pool):
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, record):
+        record.info["connected_at"] = time.monotonic()
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, record, proxy):
+        connected_at = record.info.get("connected_at")
+        if connected_at is not None:
+            DB_POOL_CONNECTION_AGE_SECONDS.labels(pool.metrics_label).observe(time.monotonic() - connected_at)
+        _report_usage(pool)
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, record):
+        _report_usage(pool)
+
+
+def pool_options(poolclass) -> dict:
+    """Engine keyword arguments for a pool sized from settings."""
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": True,
+    }
@@ -1,6 +1,70 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.instrumentation import instrument_engine
+from app.db.pool import TimedAsyncAdaptedQueuePool, TimedQueuePool, instrument_pool, pool_options
 
-engine = create_engine(settings.DATABASE_URL,   pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+
+def _async_database_url(url: str):
+    # asyncpg takes "ssl" instead of libpq's "sslmode" and rejects other libpq-only options
+    url = make_url(url)
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+    if sslmode:
+        query["ssl"] = sslmode
+    return url.set(drivername="postgresql+asyncpg", query=query)
+
+
+# Engines are created on first use (creating one imports the DB driver), so
+# importing the app, Alembic and scripts only pay for the engine they touch.
+_engine = None
+_session_factory = None
+_async_engine = None
+_async_session_factory = None
+
+
+def get_engine():
+    """Sync engine, kept for Alembic and scripts."""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(settings.DATABASE_URL, **pool_options(TimedQueuePool))
+        instrument_pool(_engine.pool)
+        instrument_engine(_engine, "sync")
+    return _engine
+
+
+def SessionLocal():
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _session_factory()
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            settings.ASYNC_DATABASE_URL or _async_database_url(settings.DATABASE_URL),
+            **pool_options(TimedAsyncAdaptedQueuePool),
+        )
+        instrument_pool(_async_engine.sync_engine.pool)
+        instrument_engine(_async_engine.sync_engine, "async")
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    global _async_session_factory
+    if _async_session_factory is None:
+        _async_session_factory = async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _async_session_factory()
+
+
+async def dispose_async_engine():
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_session_factory = None
@@ -1,33 +1,52 @@
-import time
-from sqlalchemy import text
-from sqlalchemy.exc import OperationalError
-from app.db.session import engine
+import asyncio
+from contextlib import asynccontextmanager
+from app.db.session import dispose_async_engine
 from fastapi import FastAPI
-from app.api.v1 import auth, admin, user, social_auth, lockin
-from starlette.middleware.sessions import SessionMiddleware
-from app.core.config import settings
+from app.api.v1 import auth, admin, user, social_auth, lockin, well_known, health, metrics
+from app.core.metrics import mark_process_dead
+from app.utils.serialization import AppJSONResponse
+from app.core.middleware import LazySessionMiddleware, PrometheusMiddleware, QueryStatsMiddleware
+from app.core.security import start_hash_pool, shutdown_hash_pool
+from app.services.health import warm_up
+from app.services.http import start_http_client, close_http_client
+from app.services.redis_client import start_redis, close_redis
+from app.services.principal_cache import start_invalidation_listener, stop_invalidation_listener
+from app.services.sessions import start_revocation_listener, stop_revocation_listener
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pools and clients are created without touching the network; connecting
+    # happens in the background so /healthz answers right away and /readyz
+    # reports when Postgres and Redis are reachable.
+    await start_redis()
+    start_hash_pool()
+    await start_http_client()
+    await start_invalidation_listener()
+    await start_revocation_listener()
+    warm_up_task = asyncio.create_task(warm_up())
+    yield
+    warm_up_task.cancel()
+    await close_http_client()
+    shutdown_hash_pool()
+    await stop_revocation_listener()
+    await stop_invalidation_listener()
+    await close_redis()
+    await dispose_async_engine()
+    mark_process_dead()
 
-@app.on_event("startup")
-def wait_for_db():
-    retries = 10
-    while retries > 0:
-        try:
-            with engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
-            print("Database is ready!")
-            break
-        except OperationalError:
-            print("Database not ready, waiting...")
-            time.sleep(2)
-            retries -= 1
-    else:
-        raise Exception("Database connection failed after retries")
+# orjson renders every response body; list endpoints also skip per-row
+# model validation (see app.utils.serialization)
+app = FastAPI(lifespan=lifespan, default_response_class=AppJSONResponse)
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(admin.router, prefix="/admin", tags=["admin"])
 app.include_router(user.router, prefix="/user", tags=["user"]) 
 app.include_router(lockin.router, prefix="/lockin", tags=["lockin"])
 app.include_router(social_auth.router, prefix="/api")
-app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
\ No newline at end of file
+app.include_router(well_known.router, prefix="/.well-known", tags=["well-known"])
+app.include_router(health.router, tags=["health"])
+app.include_router(metrics.router, tags=["metrics"])
+app.add_middleware(LazySessionMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+# Outermost, so the time spent in other middleware is included
+app.add_middleware(PrometheusMiddleware)
\ No newline at end of file
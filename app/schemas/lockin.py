@@ -1,8 +1,9 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class TaskBase(BaseModel):
+    name: str
     estimated_time: int
     completion_time: Optional[datetime] = None
     completed: Optional[bool] = False
@@ -12,6 +13,7 @@ class TaskCreate(TaskBase):
     pass
 
 class TaskUpdate(BaseModel):
+    name: Optional[str] = None
     estimated_time: Optional[int] = None
     completion_time: Optional[datetime] = None
     completed: Optional[bool] = None
@@ -20,6 +22,7 @@ class TaskUpdate(BaseModel):
 class TaskOut(BaseModel):
     taskid: int
     username: str
+    name: str
     estimated_time: int
     completion_time: Optional[datetime]
     completed: bool
@@ -29,6 +32,32 @@ class TaskOut(BaseModel):
     class Config:
         from_attributes = True
 
+# --- Batch sync ---
+class TaskBatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    taskidbyfrontend: int
+    name: Optional[str] = None
+    estimated_time: Optional[int] = None
+    completion_time: Optional[datetime] = None
+    completed: Optional[bool] = False
+
+    @model_validator(mode="after")
+    def check_task_fields(self):
+        if self.op != "delete" and (self.name is None or self.estimated_time is None):
+            raise ValueError("name and estimated_time are required for create and update")
+        return self
+
+class TaskBatchRequest(BaseModel):
+    operations: List[TaskBatchOperation] = Field(max_length=1000)
+
+class TaskBatchResult(BaseModel):
+    taskidbyfrontend: int
+    status: Literal["created", "updated", "deleted", "not_found"]
+    task: Optional[TaskOut] = None
+
+class TaskBatchResponse(BaseModel):
+    results: List[TaskBatchResult]
+
 # --- SavedTask Schemas ---
 class SavedTaskBase(BaseModel):
     username: str
@@ -44,6 +73,35 @@ class SavedTaskUpdate(BaseModel):
     estimated_time: Optional[int] = None
     taskidbyfrontend: Optional[int] = None
 
-class SavedTaskOut(SavedTaskBase):
+class SavedTaskOut(BaseModel):
+    id: int
+    username: str
+    name: str
+    estimated_time: int
+
     class Config:
         from_attributes = True
+
+# --- Change feed ---
+class TaskChange(TaskOut):
+    updated_at: datetime
+    deleted_at: Optional[datetime] = None
+    revision: int
+
+class SavedTaskChange(BaseModel):
+    id: int
+    username: str
+    name: str
+    estimated_time: int
+    updated_at: datetime
+    deleted_at: Optional[datetime] = None
+    revision: int
+
+    class Config:
+        from_attributes = True
+
+class ChangesResponse(BaseModel):
+    tasks: List[TaskChange]
+    saved_tasks: List[SavedTaskChange]
+    next_cursor: int
+    has_more: bool
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel, EmailStr
 
@@ -33,7 +34,11 @@ class UserOut(BaseModel):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
+
+class RefreshRequest(BaseModel):
+    refresh_token: Optional[str] = None
     
 class PasswordResetRequest(BaseModel):
     email_or_username: EmailStr
@@ -65,4 +70,14 @@ class UserOut(BaseModel):
 
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class SessionOut(BaseModel):
+    sid: str
+    created_at: datetime
+    last_used_at: datetime
+    method: str
+    ip: Optional[str] = None
+    user_agent: Optional[str] = None
+    current: bool = False
@@ -0,0 +1,42 @@
+import logging
+import time
+
+from redis import RedisError
+
+from app.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Long enough to outlive normal polling gaps; an expired counter is re-seeded
+# from the clock so it never repeats a version handed out before.
+VERSION_TTL_SECONDS = 7 * 24 * 3600
+
+
+def _key(user_id: int) -> str:
+    return f"data_version:{user_id}"
+
+
+async def get_data_version(user_id: int):
+    """Current version of a user's profile and lockin data, or None if Redis is unavailable."""
+    key = _key(user_id)
+    try:
+        async with get_redis().pipeline() as pipe:
+            pipe.set(key, time.time_ns(), nx=True, ex=VERSION_TTL_SECONDS)
+            pipe.get(key)
+            return (await pipe.execute())[1]
+    except RedisError:
+        logger.warning("Could not read data version for user %s", user_id, exc_info=True)
+        return None
+
+
+async def bump_data_version(user_id: int):
+    """Call after committing any change to a user's profile, tasks or saved tasks."""
+    key = _key(user_id)
+    try:
+        async with get_redis().pipeline() as pipe:
+            pipe.set(key, time.time_ns(), nx=True)
+            pipe.incr(key)
+            pipe.expire(key, VERSION_TTL_SECONDS)
+            await pipe.execute()
+    except RedisError:
+        logger.error("Could not bump data version for user %s; cached ETags may be stale", user_id, exc_info=True)
@@ -1,25 +1,43 @@
-from email import message
+import json
+import uuid
 from email.utils import formataddr
-import smtplib
 from email.mime.text import MIMEText
 from app.core.config import settings
+from app.core.metrics import EMAILS_QUEUED
+from app.services.redis_client import get_redis
 
 sender_name = "unkit.site"
-sender_email = settings.SMTP_USER
 
-def send_email(email_to: str, subject: str, body: str):
+# Emails are not sent inline: send_email appends them to this Redis stream and
+# the outbox worker (python -m app.workers.email_worker) delivers them.
+OUTBOX_STREAM = "email:outbox"
+OUTBOX_GROUP = "email-workers"
+RETRY_KEY = "email:retry"
+DEAD_LETTER_STREAM = "email:dead"
+
+
+def build_message(email_to: str, subject: str, body: str) -> str:
     msg = MIMEText(body, "html")
     msg["Subject"] = subject
-    msg["From"] = formataddr((sender_name, sender_email))
+    msg["From"] = formataddr((sender_name, settings.SMTP_USER))
     msg["To"] = email_to
-    with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-        server.starttls()
-        server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-        server.sendmail(settings.SMTP_USER, email_to, msg.as_string())
+    return msg.as_string()
+
+
+async def send_email(email_to: str, subject: str, body: str):
+    payload = {
+        "id": uuid.uuid4().hex,
+        "to": email_to,
+        "subject": subject,
+        "body": body,
+        "attempts": 0,
+    }
+    await get_redis().xadd(OUTBOX_STREAM, {"payload": json.dumps(payload)})
+    EMAILS_QUEUED.inc()
 
 
 #Registration OTP Email
-def send_registration_email(email_to: str, otp: str):
+async def send_registration_email(email_to: str, otp: str):
     subject = "Verify Your Email Address"
     body = f"""<body style="font-family: Arial, sans-serif; background-color: #f9f9f9; padding: 40px; color: #333;">
   <table style="max-width: 600px; margin: auto; background: #ffffff; padding: 40px; border-radius: 8px; box-shadow: 0 2px 8px rgba(0,0,0,0.05);">
@@ -47,11 +65,11 @@ def send_registration_email(email_to: str, otp: str):
   </table>
 </body>
 """
-    send_email(email_to, subject, body)
+    await send_email(email_to, subject, body)
 
 
 #Account Created Email
-def send_account_created_email(email_to: str):
+async def send_account_created_email(email_to: str):
     subject = "Account Created Successfully"
     body = f"""\
 <body style="font-family: Arial, sans-serif; background-color: #f9f9f9; padding: 40px; color: #333;">
@@ -76,11 +94,11 @@ def send_account_created_email(email_to: str):
   </table>
 </body>
 """
-    send_email(email_to, subject, body)
+    await send_email(email_to, subject, body)
 
 
 #Reset Password Email
-def send_reset_email(email_to: str, otp: str):
+async def send_reset_email(email_to: str, otp: str):
     subject = "Password Reset Request"
     body = f"""\
 <body style="font-family: Arial, sans-serif; background-color: #f9f9f9; padding: 40px; color: #333;">
@@ -108,11 +126,11 @@ def send_reset_email(email_to: str, otp: str):
   </table>
 </body>
 """
-    send_email(email_to, subject, body)
+    await send_email(email_to, subject, body)
 
 
 #Password Changed Email
-def send_password_changed_email(email_to: str):
+async def send_password_changed_email(email_to: str):
     subject = "Password Changed Successfully"
     body = f"""\
 <body style="font-family: Arial, sans-serif; background-color: #f9f9f9; padding: 40px; color: #333;">
@@ -137,4 +155,4 @@ def send_password_changed_email(email_to: str):
   </table>
 </body>
 """
-    send_email(email_to, subject, body)
\ No newline at end of file
+    await send_email(email_to, subject, body)
\ No newline at end of file
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import re
+import time
+
+from jose import JWTError, jwt
+
+from app.core.config import settings
+from app.services.http import get_http_client
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_ISSUERS = ("https://accounts.google.com", "accounts.google.com")
+DEFAULT_MAX_AGE_SECONDS = 3600
+# Refresh in the background once this fraction of max-age has elapsed
+REFRESH_AHEAD_RATIO = 0.8
+# Unknown kid: refetch the JWKS at most this often (Google rotated its keys)
+MIN_FORCED_REFRESH_SECONDS = 60
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class _CachedJSON:
+    """A JSON document cached for its Cache-Control max-age.
+
+    Reads never wait on the network while a fresh copy is held: once the
+    document is past REFRESH_AHEAD_RATIO of its lifetime a background task
+    refetches it. Only a missing or fully expired document is fetched inline,
+    and concurrent callers share that one fetch.
+    """
+
+    def __init__(self, url_getter):
+        self._url_getter = url_getter
+        self.value = None
+        self._fetched_at = 0.0
+        self._max_age = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task = None
+
+    async def _fetch(self, url: str):
+        resp = await get_http_client().get(url)
+        resp.raise_for_status()
+        match = _MAX_AGE_RE.search(resp.headers.get("cache-control", ""))
+        self.value = resp.json()
+        self._max_age = int(match.group(1)) if match else DEFAULT_MAX_AGE_SECONDS
+        self._fetched_at = time.monotonic()
+
+    async def _refresh(self):
+        # Resolved once up front so a failure is logged without fetching again
+        url = None
+        try:
+            url = await self._url_getter()
+            async with self._lock:
+                await self._fetch(url)
+        except Exception:
+            logger.warning("Background refresh of %s failed", url or "the URL", exc_info=True)
+
+    async def get(self, force: bool = False):
+        age = time.monotonic() - self._fetched_at
+        if force or self.value is None or age >= self._max_age:
+            async with self._lock:
+                if force or self.value is None or time.monotonic() - self._fetched_at >= self._max_age:
+                    await self._fetch(await self._url_getter())
+        elif age >= self._max_age * REFRESH_AHEAD_RATIO and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh())
+        return self.value
+
+    def age(self) -> float:
+        return time.monotonic() - self._fetched_at
+
+
+async def _discovery_url():
+    return settings.GOOGLE_DISCOVERY_URL
+
+
+_discovery = _CachedJSON(_discovery_url)
+
+
+async def _jwks_url():
+    return (await _discovery.get())["jwks_uri"]
+
+
+_jwks = _CachedJSON(_jwks_url)
+
+
+async def get_token_endpoint() -> str:
+    return (await _discovery.get())["token_endpoint"]
+
+
+async def _signing_key(kid: str):
+    keys = (await _jwks.get())["keys"]
+    key = next((k for k in keys if k.get("kid") == kid), None)
+    if key is None and _jwks.age() >= MIN_FORCED_REFRESH_SECONDS:
+        keys = (await _jwks.get(force=True))["keys"]
+        key = next((k for k in keys if k.get("kid") == kid), None)
+    return key
+
+
+async def verify_id_token(id_token: str, access_token: str = None) -> dict:
+    """Validate a Google id_token locally and return its claims.
+
+    Checks the signature against Google's cached JWKS, plus audience,
+    issuer, expiry and (when an access token is given) at_hash. Raises
+    JWTError if any check fails.
+    """
+    header = jwt.get_unverified_header(id_token)
+    key = await _signing_key(header.get("kid"))
+    if key is None:
+        raise JWTError("Unknown signing key")
+    return jwt.decode(
+        id_token,
+        key,
+        algorithms=[key.get("alg", "RS256")],
+        audience=settings.GOOGLE_CLIENT_ID,
+        issuer=GOOGLE_ISSUERS,
+        access_token=access_token,
+    )
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import random
+import time
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import get_async_engine
+from app.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+async def _check_database():
+    async with get_async_engine().connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def _check_redis():
+    await get_redis().ping()
+
+
+CHECKS = {
+    "database": _check_database,
+    "redis": _check_redis,
+}
+
+
+async def _probe(name: str) -> str:
+    try:
+        await asyncio.wait_for(CHECKS[name](), settings.HEALTH_CHECK_TIMEOUT_SECONDS)
+        return "ok"
+    except Exception as exc:
+        return f"error: {type(exc).__name__}"
+
+
+class Readiness:
+    """Dependency status shared by /readyz probes.
+
+    Probes read the cached result; at most one re-check per
+    READINESS_CACHE_SECONDS actually touches Postgres and Redis, however
+    often the orchestrator polls.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.status = {name: "pending" for name in CHECKS}
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.started and all(state == "ok" for state in self.status.values())
+
+    async def refresh(self):
+        async with self._lock:
+            if time.monotonic() - self._checked_at < settings.READINESS_CACHE_SECONDS:
+                return
+            results = await asyncio.gather(*(_probe(name) for name in CHECKS))
+            self.status = dict(zip(CHECKS, results))
+            self._checked_at = time.monotonic()
+
+    def record(self, name: str, state: str):
+        self.status[name] = state
+        self._checked_at = time.monotonic()
+
+
+readiness = Readiness()
+
+
+async def _connect_with_backoff(name: str):
+    """Retry a dependency with capped exponential backoff and jitter."""
+    delay = 0.5
+    for attempt in range(1, settings.STARTUP_MAX_ATTEMPTS + 1):
+        state = await _probe(name)
+        readiness.record(name, state)
+        if state == "ok":
+            logger.info("%s is ready", name)
+            return
+        logger.warning("%s not ready (attempt %d/%d): %s", name, attempt, settings.STARTUP_MAX_ATTEMPTS, state)
+        if attempt < settings.STARTUP_MAX_ATTEMPTS:
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, 10)
+    # Keep serving: /readyz stays failing and re-checks on its own schedule
+    logger.error("%s still unavailable after %d attempts", name, settings.STARTUP_MAX_ATTEMPTS)
+
+
+async def warm_up():
+    """Connect to every dependency concurrently; runs in the background after startup."""
+    await asyncio.gather(*(_connect_with_backoff(name) for name in CHECKS))
+    readiness.started = True
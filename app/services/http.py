@@ -0,0 +1,58 @@
+import time
+
+from app.core.config import settings
+from app.core.metrics import OAUTH_REQUEST_SECONDS, OAUTH_REQUESTS
+
+# One keep-alive client per worker for outbound OAuth calls, opened and closed
+# by the app lifespan, so callbacks reuse TCP/TLS connections to the providers.
+# httpx is imported on first use: importing it also loads its CLI (rich,
+# click), which is a large share of app import time.
+_client = None
+
+
+async def _on_request(request):
+    request.extensions["started_at"] = time.perf_counter()
+
+
+async def _on_response(response):
+    host = response.request.url.host
+    OAUTH_REQUESTS.labels(host, str(response.status_code)).inc()
+    started_at = response.request.extensions.get("started_at")
+    if started_at is not None:
+        OAUTH_REQUEST_SECONDS.labels(host).observe(time.perf_counter() - started_at)
+
+
+def _create_client():
+    import httpx
+
+    return httpx.AsyncClient(
+        event_hooks={"request": [_on_request], "response": [_on_response]},
+        http2=settings.OAUTH_HTTP2,
+        timeout=httpx.Timeout(settings.OAUTH_TIMEOUT_SECONDS, connect=settings.OAUTH_CONNECT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=settings.OAUTH_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OAUTH_MAX_CONNECTIONS,
+            keepalive_expiry=60,
+        ),
+    )
+
+
+async def start_http_client():
+    global _client
+    if _client is None:
+        _client = _create_client()
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client():
+    global _client
+    if _client is None:
+        # Outside the app lifespan (scripts, tests)
+        _client = _create_client()
+    return _client
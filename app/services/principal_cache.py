@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from redis import RedisError
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.core.metrics import PRINCIPAL_CACHE_HITS, PRINCIPAL_CACHE_MISSES
+from app.db.models.user import User
+from app.services.redis_client import create_sync_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "principal_cache:invalidate"
+
+
+class PrincipalCache:
+    """Bounded TTL/LRU cache of resolved users, keyed by token subject (email).
+
+    Entries are detached ORM instances, so they must only be read. Every
+    invalidation bumps ``generation``; a loader that started before an
+    invalidation passes the generation it saw to ``set`` and its (possibly
+    stale) result is dropped instead of cached.
+    """
+
+    def __init__(self, maxsize: int = None, ttl_seconds: float = None):
+        self._maxsize = maxsize
+        self._ttl_seconds = ttl_seconds
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Read from settings on use so importing this module does not load them
+    @property
+    def maxsize(self) -> int:
+        return settings.PRINCIPAL_CACHE_MAX_SIZE if self._maxsize is None else self._maxsize
+
+    @property
+    def ttl_seconds(self) -> float:
+        return settings.PRINCIPAL_CACHE_TTL_SECONDS if self._ttl_seconds is None else self._ttl_seconds
+
+    def get(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+        if entry is None:
+            PRINCIPAL_CACHE_MISSES.inc()
+            return None
+        PRINCIPAL_CACHE_HITS.inc()
+        return entry[1]
+
+    def set(self, key: str, value, generation: int):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key: str):
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+
+principal_cache = PrincipalCache()
+
+_listener: asyncio.Task | None = None
+# Publishes scheduled from commit hooks, held so they are not garbage collected
+_pending_publishes = set()
+
+
+async def _publish(email: str):
+    try:
+        await get_redis().publish(INVALIDATION_CHANNEL, email)
+    except RedisError:
+        # Other workers fall back to the TTL for this entry.
+        logger.warning("Could not publish principal cache invalidation for %s", email, exc_info=True)
+
+
+async def invalidate_principal(email: str):
+    """Drop a user from this worker's cache and tell every other worker to do the same."""
+    email = email.lower()
+    principal_cache.discard(email)
+    await _publish(email)
+
+
+def _invalidate_from_sync(email: str):
+    email = email.lower()
+    principal_cache.discard(email)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Plain sync session (admin scripts): no loop to publish from
+        try:
+            create_sync_redis().publish(INVALIDATION_CHANNEL, email)
+        except RedisError:
+            logger.warning("Could not publish principal cache invalidation for %s", email, exc_info=True)
+        return
+    task = loop.create_task(_publish(email))
+    _pending_publishes.add(task)
+    task.add_done_callback(_pending_publishes.discard)
+
+
+# Account flags can be changed from admin tooling or scripts rather than the
+# routes that call invalidate_principal directly, so invalidate on commit.
+@event.listens_for(User, "after_update")
+def _track_flag_changes(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ("is_admin", "is_active")):
+        pending = object_session(target).info.setdefault("invalidate_principals", set())
+        pending.add(target.email)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    for email in session.info.pop("invalidate_principals", ()):
+        _invalidate_from_sync(email)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("invalidate_principals", None)
+
+
+async def _listen():
+    while True:
+        pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            while True:
+                # Poll rather than listen(): a blocking read would trip the socket timeout
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    principal_cache.discard(message["data"])
+        except RedisError as exc:
+            # Invalidations may have been missed while disconnected.
+            logger.warning("Principal cache invalidation listener error: %s", exc)
+            principal_cache.clear()
+        finally:
+            await pubsub.aclose()
+        await asyncio.sleep(1)
+
+
+async def start_invalidation_listener():
+    global _listener
+    if _listener is None:
+        _listener = asyncio.create_task(_listen())
+
+
+async def stop_invalidation_listener():
+    global _listener
+    if _listener is None:
+        return
+    _listener.cancel()
+    try:
+        await _listener
+    except asyncio.CancelledError:
+        pass
+    _listener = None
@@ -0,0 +1,51 @@
+import logging
+import time
+import uuid
+
+from redis import RedisError
+
+from app.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Sliding-window log: each bucket is a ZSET of request timestamps (ms). A
+# request is admitted only if every bucket is under its limit, and only
+# admitted requests are recorded. Returns 0, or the ms until a slot frees up.
+# KEYS: buckets. ARGV: now, window, member, then one limit per bucket.
+_SLIDING_WINDOW = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local wait = 0
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    if redis.call('ZCARD', key) >= tonumber(ARGV[3 + i]) then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        wait = math.max(wait, tonumber(oldest[2]) + window - now, 1)
+    end
+end
+if wait > 0 then
+    return wait
+end
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, ARGV[3])
+    redis.call('PEXPIRE', key, window)
+end
+return 0
+"""
+
+
+async def hit(buckets: dict, window_seconds: int) -> float:
+    """Record one request against each bucket ({key: limit}) in a single round trip.
+
+    Returns 0 if admitted, otherwise the seconds until the caller may retry.
+    Fails open (returns 0) when Redis is unavailable.
+    """
+    now_ms = int(time.time() * 1000)
+    args = [now_ms, window_seconds * 1000, f"{now_ms}-{uuid.uuid4().hex[:8]}", *buckets.values()]
+    try:
+        script = get_redis().register_script(_SLIDING_WINDOW)
+        wait_ms = await script(keys=list(buckets), args=args)
+    except RedisError:
+        logger.warning("Rate limiter unavailable, admitting request", exc_info=True)
+        return 0
+    return wait_ms / 1000
@@ -0,0 +1,85 @@
+import time
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.core.metrics import REDIS_COMMANDS, REDIS_ROUND_TRIP_SECONDS
+
+# One pooled asyncio client per worker, opened and closed by the app lifespan.
+_client: aioredis.Redis | None = None
+
+
+class _InstrumentedPipeline(aioredis.client.Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        for args, _ in self.command_stack:
+            REDIS_COMMANDS.labels(str(args[0]).upper()).inc()
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            REDIS_ROUND_TRIP_SECONDS.labels("PIPELINE").observe(time.perf_counter() - start)
+
+
+class InstrumentedRedis(aioredis.Redis):
+    """Counts commands and times round trips for the redis_* metrics."""
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        REDIS_COMMANDS.labels(command).inc()
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_ROUND_TRIP_SECONDS.labels(command).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None):
+        return _InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def _connection_kwargs() -> dict:
+    return dict(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        password=settings.REDIS_PASSWORD,
+        db=0,
+        decode_responses=True,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        health_check_interval=30,
+    )
+
+
+def _create_client() -> aioredis.Redis:
+    pool = aioredis.BlockingConnectionPool(
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        **_connection_kwargs(),
+    )
+    return InstrumentedRedis(connection_pool=pool)
+
+
+async def start_redis():
+    global _client
+    if _client is None:
+        _client = _create_client()
+
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_redis() -> aioredis.Redis:
+    global _client
+    if _client is None:
+        # Outside the app lifespan (scripts, tests)
+        _client = _create_client()
+    return _client
+
+
+def create_sync_redis() -> redis.Redis:
+    """Blocking client for processes without an event loop (the email worker, admin scripts)."""
+    return redis.Redis(**_connection_kwargs())
@@ -1,51 +1,98 @@
-import redis
-import json
 from app.core.config import settings
+from app.services.redis_client import get_redis
 
-r = redis.Redis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    password=settings.REDIS_PASSWORD,
-    db=0,
-    decode_responses=True
-)
-
-def save_otp_registration(email: str, username: str, hashed_password: str, otp: str, ttl_seconds=600):
-    email = email.lower()
-    username = username.lower()
+# Pending OTPs are hashes holding the code, a wrong-guess counter and whatever
+# the follow-up step needs. Each operation below is a single round trip.
+
+# Returns the stored fields and deletes the key when the code matches. A wrong
+# code counts an attempt and discards the key after ARGV[2] of them.
+_CONSUME = """
+local otp = redis.call('HGET', KEYS[1], 'otp')
+if not otp then
+    return false
+end
+if otp == ARGV[1] then
+    local data = redis.call('HGETALL', KEYS[1])
+    redis.call('DEL', KEYS[1])
+    return data
+end
+if redis.call('HINCRBY', KEYS[1], 'attempts', 1) >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+end
+return false
+"""
+
+# Replaces the code of a pending OTP (resend) and restarts its TTL
+_REFRESH = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'otp', ARGV[1], 'attempts', 0)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+def _reg_key(email: str) -> str:
+    return f"otp:reg:{email.lower()}"
+
+
+def _reset_key(email: str) -> str:
+    return f"otp:reset:{email.lower()}"
+
+
+async def _save(key: str, data: dict, ttl_seconds: int):
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.hset(key, mapping={**data, "attempts": 0})
+        pipe.expire(key, ttl_seconds)
+        await pipe.execute()
+
+
+async def _consume(key: str, otp: str):
+    consume = get_redis().register_script(_CONSUME)
+    data = await consume(keys=[key], args=[otp, settings.OTP_MAX_ATTEMPTS])
+    if not data:
+        return None
+    return dict(zip(data[::2], data[1::2]))
+
+
+async def _refresh(key: str, otp: str, ttl_seconds: int) -> bool:
+    refresh = get_redis().register_script(_REFRESH)
+    return bool(await refresh(keys=[key], args=[otp, ttl_seconds]))
+
+
+async def save_otp_registration(email: str, username: str, hashed_password: str, otp: str, ttl_seconds=None):
     data = {
-        "email": email,
-        "username": username,
+        "email": email.lower(),
+        "username": username.lower(),
         "hashed_password": hashed_password,
         "otp": otp,
     }
-    r.set(f"otp_reg:{email}", json.dumps(data), ex=ttl_seconds)
+    await _save(_reg_key(email), data, ttl_seconds or settings.OTP_TTL_SECONDS)
 
 
+async def consume_otp_registration(email: str, otp: str):
+    """Pending registration if the code matches (it is consumed), else None."""
+    return await _consume(_reg_key(email), otp)
 
-def get_otp_registration(email: str):
-    email = email.lower()
-    data = r.get(f"otp_reg:{email}")
-    return json.loads(data) if data else None
 
-def delete_otp_registration(email: str):
-    email = email.lower()
-    r.delete(f"otp_reg:{email}")
+async def refresh_otp_registration(email: str, otp: str, ttl_seconds=None) -> bool:
+    """Swap in a new code; False if there is no pending registration."""
+    return await _refresh(_reg_key(email), otp, ttl_seconds or settings.OTP_TTL_SECONDS)
 
 
-def save_otp_reset(email: str, otp: str, ttl_seconds=600):
-    email = email.lower()
+async def save_otp_reset(email: str, otp: str, ttl_seconds=None):
     data = {
-        "email": email,
+        "email": email.lower(),
         "otp": otp,
     }
-    r.set(f"otp_reset:{email}", json.dumps(data), ex=ttl_seconds)
+    await _save(_reset_key(email), data, ttl_seconds or settings.OTP_TTL_SECONDS)
+
+
+async def consume_otp_reset(email: str, otp: str):
+    return await _consume(_reset_key(email), otp)
 
-def get_otp_reset(email: str):
-    email = email.lower()
-    data = r.get(f"otp_reset:{email}")
-    return json.loads(data) if data else None
 
-def delete_otp_reset(email: str):
-    email = email.lower()
-    r.delete(f"otp_reset:{email}")
\ No newline at end of file
+async def refresh_otp_reset(email: str, otp: str, ttl_seconds=None) -> bool:
+    return await _refresh(_reset_key(email), otp, ttl_seconds or settings.OTP_TTL_SECONDS)
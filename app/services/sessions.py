@@ -0,0 +1,264 @@
+"""Login sessions backed by rotating refresh-token families in Redis.
+
+Every login starts a session (sid). Its family hash records the jti of the one
+refresh token that may still be used; /auth/refresh swaps it atomically for a
+new one. Presenting an older refresh token means it leaked, so the whole
+session is revoked. Access tokens carry the sid, and revoked sids are kept in
+a ZSET (scored by when their last access token expires) so the per-request
+check is a single ZSCORE. An optional Bloom filter of revoked sids, kept in
+sync over pub/sub, lets most requests skip even that.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import time
+import uuid
+
+from redis import RedisError
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.security import access_token_lifetime, create_access_token, create_refresh_token, refresh_token_lifetime
+from app.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+REVOKED_KEY = "sessions:revoked"
+REVOKED_CHANNEL = "sessions:revoked"
+BLOOM_REBUILD_SECONDS = 600
+
+
+def _family_key(sid: str) -> str:
+    return f"refresh_family:{sid}"
+
+
+def _user_sessions_key(user_id) -> str:
+    return f"sessions:{user_id}"
+
+
+# Returns {'ok', user_id} after rotating, {'reused', user_id} if the presented
+# jti is not the current one, or {} if the family is gone (revoked/expired).
+_ROTATE = """
+local current = redis.call('HGET', KEYS[1], 'jti')
+if not current then
+    return {}
+end
+local user = redis.call('HGET', KEYS[1], 'user')
+if current ~= ARGV[1] then
+    return {'reused', user}
+end
+redis.call('HSET', KEYS[1], 'jti', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {'ok', user}
+"""
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+# None until loaded from Redis, and again whenever revocations may have been
+# missed; callers then ask Redis directly.
+_bloom: BloomFilter | None = None
+_listener: asyncio.Task | None = None
+
+
+def _lifetime_seconds(lifetime) -> int:
+    return int(lifetime.total_seconds())
+
+
+def _last_used_field(sid: str) -> str:
+    return f"{sid}:last_used"
+
+
+async def start_session(user, request: Request, method: str, extra_claims: dict = None) -> dict:
+    """Open a session for a user who just authenticated; returns the token response.
+
+    The user's registry (sessions:{user_id}) maps each sid to device metadata,
+    plus a "{sid}:last_used" field bumped on every refresh, so listing all
+    sessions is one HGETALL.
+    """
+    sid = uuid.uuid4().hex
+    jti = uuid.uuid4().hex
+    now = int(time.time())
+    ttl = _lifetime_seconds(refresh_token_lifetime())
+    device = {
+        "created_at": now,
+        "method": method,
+        "ip": request.client.host if request.client else None,
+        "user_agent": request.headers.get("user-agent", "")[:256],
+    }
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.hset(_family_key(sid), mapping={"user": user.id, "jti": jti, "created_at": now})
+        pipe.expire(_family_key(sid), ttl)
+        pipe.hset(_user_sessions_key(user.id), mapping={sid: json.dumps(device), _last_used_field(sid): now})
+        pipe.expire(_user_sessions_key(user.id), ttl)
+        await pipe.execute()
+    return {
+        "access_token": create_access_token({"sub": user.email, "sid": sid, **(extra_claims or {})}),
+        "refresh_token": create_refresh_token({"sub": user.email, "sid": sid, "jti": jti}),
+        "token_type": "bearer",
+    }
+
+
+async def rotate_refresh_token(sid: str, jti: str):
+    """Consume a refresh token. Returns (user_id, new_jti), or None if it must be rejected."""
+    new_jti = uuid.uuid4().hex
+    ttl = _lifetime_seconds(refresh_token_lifetime())
+    rotate = get_redis().register_script(_ROTATE)
+    result = await rotate(keys=[_family_key(sid)], args=[jti, new_jti, ttl])
+    if not result:
+        return None
+    status, user_id = result
+    if status == "reused":
+        logger.warning("Refresh token reuse detected for session %s of user %s; revoking the session", sid, user_id)
+        await revoke_session(user_id, sid)
+        return None
+    async with get_redis().pipeline(transaction=False) as pipe:
+        pipe.hset(_user_sessions_key(user_id), _last_used_field(sid), int(time.time()))
+        pipe.expire(_user_sessions_key(user_id), ttl)
+        await pipe.execute()
+    return int(user_id), new_jti
+
+
+async def has_session(user_id, sid: str) -> bool:
+    # The registry also holds "{sid}:last_used" fields, which are not sessions
+    if sid.endswith(":last_used"):
+        return False
+    return bool(await get_redis().hexists(_user_sessions_key(user_id), sid))
+
+
+async def list_sessions(user_id) -> list:
+    """The user's live sessions, most recently used first."""
+    registry = await get_redis().hgetall(_user_sessions_key(user_id))
+    now = time.time()
+    lifetime = refresh_token_lifetime().total_seconds()
+    sessions, expired = [], []
+    for sid, value in registry.items():
+        if sid.endswith(":last_used"):
+            continue
+        last_used = int(registry.get(_last_used_field(sid), 0))
+        if last_used + lifetime <= now:
+            expired.append(sid)
+            continue
+        sessions.append({"sid": sid, "last_used_at": last_used, **json.loads(value)})
+    if expired:
+        # Their families have already expired in Redis
+        await get_redis().hdel(_user_sessions_key(user_id), *expired, *map(_last_used_field, expired))
+    return sorted(sessions, key=lambda session: session["last_used_at"], reverse=True)
+
+
+async def revoke_sessions(user_id, sids):
+    if not sids:
+        return
+    now = time.time()
+    # Access tokens of the session stay verifiable until they expire
+    revoked_until = now + access_token_lifetime().total_seconds()
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.delete(*[_family_key(sid) for sid in sids])
+        pipe.hdel(_user_sessions_key(user_id), *sids, *map(_last_used_field, sids))
+        pipe.zadd(REVOKED_KEY, {sid: revoked_until for sid in sids})
+        pipe.zremrangebyscore(REVOKED_KEY, "-inf", now)
+        for sid in sids:
+            pipe.publish(REVOKED_CHANNEL, sid)
+        await pipe.execute()
+    if _bloom is not None:
+        for sid in sids:
+            _bloom.add(sid)
+
+
+async def revoke_session(user_id, sid: str):
+    await revoke_sessions(user_id, [sid])
+
+
+async def revoke_all_sessions(user_id):
+    fields = await get_redis().hkeys(_user_sessions_key(user_id))
+    await revoke_sessions(user_id, [sid for sid in fields if not sid.endswith(":last_used")])
+
+
+def needs_revocation_check(sid: str) -> bool:
+    """False when the Bloom filter proves the session was never revoked."""
+    bloom = _bloom
+    return bloom is None or sid in bloom
+
+
+async def is_session_revoked(sid: str) -> bool:
+    if not needs_revocation_check(sid):
+        return False
+    try:
+        revoked_until = await get_redis().zscore(REVOKED_KEY, sid)
+    except RedisError:
+        # Fail open: Redis being down must not log everyone out
+        logger.warning("Could not check revocation of session %s", sid, exc_info=True)
+        return False
+    return revoked_until is not None and revoked_until > time.time()
+
+
+async def _load_bloom() -> BloomFilter:
+    bloom = BloomFilter(settings.REVOCATION_BLOOM_CAPACITY)
+    for sid in await get_redis().zrangebyscore(REVOKED_KEY, time.time(), "+inf"):
+        bloom.add(sid)
+    return bloom
+
+
+async def _listen():
+    global _bloom
+    while True:
+        pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+        try:
+            # Subscribe before loading so no revocation falls in between
+            await pubsub.subscribe(REVOKED_CHANNEL)
+            _bloom = await _load_bloom()
+            loaded_at = time.monotonic()
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    _bloom.add(message["data"])
+                if time.monotonic() - loaded_at >= BLOOM_REBUILD_SECONDS:
+                    # Drops expired revocations, which a Bloom filter cannot remove
+                    _bloom = await _load_bloom()
+                    loaded_at = time.monotonic()
+        except RedisError as exc:
+            logger.warning("Session revocation listener error: %s", exc)
+        finally:
+            _bloom = None
+            await pubsub.aclose()
+        await asyncio.sleep(1)
+
+
+async def start_revocation_listener():
+    global _listener
+    if _listener is None and settings.REVOCATION_BLOOM_CAPACITY > 0:
+        _listener = asyncio.create_task(_listen())
+
+
+async def stop_revocation_listener():
+    global _listener
+    if _listener is None:
+        return
+    _listener.cancel()
+    try:
+        await _listener
+    except asyncio.CancelledError:
+        pass
+    _listener = None
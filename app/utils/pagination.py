@@ -0,0 +1,17 @@
+import base64
+from datetime import datetime
+
+
+def encode_cursor(created_at: datetime, taskid: int) -> str:
+    raw = f"{created_at.isoformat()}|{taskid}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of encode_cursor. Raises ValueError for anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, taskid = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(taskid)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
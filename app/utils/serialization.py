@@ -0,0 +1,75 @@
+import zlib
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+# Aware datetimes as "...Z" rather than orjson's default "+00:00", the same as
+# Pydantic writes them, so bodies don't depend on which path encoded them
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+class AppJSONResponse(ORJSONResponse):
+    """The app's default response class (see ORJSON_OPTIONS)."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def rows_response(rows, response: Response | None = None) -> AppJSONResponse:
+    """JSON array of Core rows, one object per row keyed by column label.
+
+    For list endpoints whose query selects exactly the response schema's
+    fields: this skips building a Pydantic model per row and encodes straight
+    from the row values with orjson. Headers that dependencies set on the
+    injected ``response`` (ETag, X-Next-Cursor) are carried over, since
+    FastAPI ignores that object when a Response is returned.
+    """
+    content = []
+    if rows:
+        keys = rows[0]._fields
+        content = [dict(zip(keys, row)) for row in rows]
+    return AppJSONResponse(content, headers=response.headers if response is not None else None)
+
+
+def ndjson_lines(rows) -> bytes:
+    """Rows as newline-delimited JSON objects, one line per row."""
+    if not rows:
+        return b""
+    keys = rows[0]._fields
+    return b"".join(dumps(dict(zip(keys, row))) + b"\n" for row in rows)
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """Whether an Accept-Encoding header allows gzip, honouring q-values
+    (``gzip;q=0`` refuses it, ``*`` stands in for codings not listed)."""
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding.lower()] = q
+    q = weights.get("gzip", weights.get("x-gzip", weights.get("*", 0.0)))
+    return q > 0
+
+
+async def gzip_chunks(chunks):
+    """Gzip an async stream of byte chunks, flushing after each chunk so
+    compressed data goes out as the input arrives."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,241 @@
+"""Outbox worker: delivers emails queued by app.services.email.send_email.
+
+Run one or more of these next to the API:
+
+    python -m app.workers.email_worker
+
+Each worker reads batches from the outbox stream through a consumer group and
+sends them over a few long-lived, already-authenticated SMTP connections.
+Failed sends are retried with exponential backoff via a delay queue and moved
+to a dead-letter stream after EMAIL_MAX_ATTEMPTS; malformed entries, permanent
+(5xx) rejections and unexpected errors go there straight away. Entries left
+pending by a crashed worker are reclaimed after CLAIM_IDLE_MS.
+"""
+import json
+import logging
+import os
+import random
+import signal
+import smtplib
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from prometheus_client import start_http_server
+from redis import RedisError, ResponseError
+
+from app.core.config import settings
+from app.core.metrics import SMTP_SEND_SECONDS, SMTP_SENDS
+from app.services.email import DEAD_LETTER_STREAM, OUTBOX_GROUP, OUTBOX_STREAM, RETRY_KEY, build_message
+from app.services.redis_client import create_sync_redis
+
+logger = logging.getLogger(__name__)
+
+BLOCK_MS = 2000
+CLAIM_IDLE_MS = 60_000
+CLAIM_INTERVAL_SECONDS = 30
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 15 * 60
+REDIS_RETRY_BASE_SECONDS = 1
+REDIS_RETRY_MAX_SECONDS = 30
+PAYLOAD_FIELDS = {"id", "to", "subject", "body", "attempts"}
+
+# Moves retries that are due back onto the outbox stream atomically
+_PROMOTE_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, payload in ipairs(due) do
+    redis.call('XADD', KEYS[2], '*', 'payload', payload)
+    redis.call('ZREM', KEYS[1], payload)
+end
+return #due
+"""
+
+
+def is_permanent_failure(error: Exception) -> bool:
+    """Whether the server rejected the message itself (5xx), so retrying is pointless.
+
+    5xx replies to connecting, HELO, login or our sender address are left
+    retryable: they fail every message alike until the config is fixed.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, (smtplib.SMTPConnectError, smtplib.SMTPHeloError,
+                          smtplib.SMTPAuthenticationError, smtplib.SMTPSenderRefused)):
+        return False
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+class SMTPConnection:
+    """A lazily opened SMTP session that is reused across messages."""
+
+    def __init__(self):
+        self._smtp = None
+
+    def _connect(self):
+        smtp = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS)
+        if settings.SMTP_STARTTLS:
+            smtp.starttls()
+        if settings.SMTP_USER and settings.SMTP_PASSWORD:
+            smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        self._smtp = smtp
+
+    def send(self, email_to: str, message: str):
+        if self._smtp is None:
+            self._connect()
+        try:
+            self._smtp.sendmail(settings.SMTP_USER, email_to, message)
+        except smtplib.SMTPServerDisconnected:
+            # Servers drop idle sessions; reconnect once and retry
+            self._smtp = None
+            self._connect()
+            self._smtp.sendmail(settings.SMTP_USER, email_to, message)
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+class EmailWorker:
+    def __init__(self):
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.stopping = threading.Event()
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._last_claim = 0.0
+        # The worker has no event loop, so it uses a blocking client
+        self.redis = create_sync_redis()
+        self._promote_due = self.redis.register_script(_PROMOTE_DUE)
+
+    def _connection(self) -> SMTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = SMTPConnection()
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _deliver(self, entry):
+        """Send one entry; returns (entry_id, fields, payload, error, retryable)."""
+        entry_id, fields = entry
+        try:
+            payload = json.loads(fields["payload"])
+            missing = PAYLOAD_FIELDS - payload.keys()
+            if missing:
+                raise ValueError(f"missing {', '.join(sorted(missing))}")
+            message = build_message(payload["to"], payload["subject"], payload["body"])
+        except Exception as e:
+            # Retrying a malformed entry cannot help
+            logger.exception("Malformed email entry %s", entry_id)
+            return entry_id, fields, None, e, False
+        start = time.perf_counter()
+        try:
+            self._connection().send(payload["to"], message)
+            SMTP_SENDS.labels("sent").inc()
+            return entry_id, fields, payload, None, False
+        except (smtplib.SMTPException, OSError) as e:
+            self._connection().close()
+            SMTP_SENDS.labels("failed").inc()
+            if is_permanent_failure(e):
+                logger.error("Email %s to %s rejected permanently: %s", payload["id"], payload["to"], e)
+                return entry_id, fields, payload, e, False
+            return entry_id, fields, payload, e, True
+        except Exception as e:
+            logger.exception("Unexpected error sending email %s", payload["id"])
+            self._connection().close()
+            SMTP_SENDS.labels("failed").inc()
+            return entry_id, fields, payload, e, False
+        finally:
+            SMTP_SEND_SECONDS.observe(time.perf_counter() - start)
+
+    def _ensure_group(self):
+        try:
+            self.redis.xgroup_create(OUTBOX_STREAM, OUTBOX_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def _next_batch(self):
+        now = time.monotonic()
+        if now - self._last_claim >= CLAIM_INTERVAL_SECONDS:
+            self._last_claim = now
+            claimed = self.redis.xautoclaim(
+                OUTBOX_STREAM, OUTBOX_GROUP, self.consumer,
+                min_idle_time=CLAIM_IDLE_MS, start_id="0-0", count=settings.EMAIL_BATCH_SIZE,
+            )[1]
+            # Entries deleted while pending come back without fields
+            claimed = [entry for entry in claimed if entry[1]]
+            if claimed:
+                return claimed
+        response = self.redis.xreadgroup(
+            OUTBOX_GROUP, self.consumer, {OUTBOX_STREAM: ">"},
+            count=settings.EMAIL_BATCH_SIZE, block=BLOCK_MS,
+        )
+        return response[0][1] if response else []
+
+    def _settle(self, results):
+        pipe = self.redis.pipeline()
+        for entry_id, fields, payload, error, retryable in results:
+            if error is not None and not retryable:
+                dead = payload if payload is not None else fields
+                pipe.xadd(DEAD_LETTER_STREAM, {"payload": json.dumps(dead), "error": repr(error)})
+            elif error is not None:
+                payload["attempts"] += 1
+                if payload["attempts"] >= settings.EMAIL_MAX_ATTEMPTS:
+                    logger.error("Giving up on email %s to %s: %s", payload["id"], payload["to"], error)
+                    pipe.xadd(DEAD_LETTER_STREAM, {"payload": json.dumps(payload), "error": str(error)})
+                else:
+                    delay = min(BACKOFF_BASE_SECONDS * 2 ** payload["attempts"], BACKOFF_MAX_SECONDS)
+                    delay *= random.uniform(0.8, 1.2)
+                    logger.warning("Email %s to %s failed (attempt %s), retrying in %.0fs: %s",
+                                   payload["id"], payload["to"], payload["attempts"], delay, error)
+                    pipe.zadd(RETRY_KEY, {json.dumps(payload): time.time() + delay})
+            pipe.xack(OUTBOX_STREAM, OUTBOX_GROUP, entry_id)
+            pipe.xdel(OUTBOX_STREAM, entry_id)
+        pipe.execute()
+
+    def run(self):
+        logger.info("Email worker %s started", self.consumer)
+        group_ready = False
+        retry_delay = REDIS_RETRY_BASE_SECONDS
+        with ThreadPoolExecutor(max_workers=settings.EMAIL_WORKER_CONCURRENCY) as pool:
+            while not self.stopping.is_set():
+                try:
+                    if not group_ready:
+                        self._ensure_group()
+                        group_ready = True
+                    self._promote_due(keys=[RETRY_KEY, OUTBOX_STREAM], args=[time.time(), settings.EMAIL_BATCH_SIZE])
+                    batch = self._next_batch()
+                    if batch:
+                        self._settle(list(pool.map(self._deliver, batch)))
+                except RedisError:
+                    # Entries already read stay pending and are picked up
+                    # again by XAUTOCLAIM; the group may be gone after a failover
+                    logger.warning("Email worker %s lost Redis, retrying in %ss", self.consumer, retry_delay, exc_info=True)
+                    group_ready = False
+                    self.stopping.wait(retry_delay)
+                    retry_delay = min(retry_delay * 2, REDIS_RETRY_MAX_SECONDS)
+                else:
+                    retry_delay = REDIS_RETRY_BASE_SECONDS
+        for conn in self._connections:
+            conn.close()
+        logger.info("Email worker %s stopped", self.consumer)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if settings.EMAIL_WORKER_METRICS_PORT:
+        start_http_server(settings.EMAIL_WORKER_METRICS_PORT)
+    worker = EmailWorker()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: worker.stopping.set())
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark: list-endpoint cost per row, ORM + Pydantic + json vs Core rows + orjson.
+
+Run from the repo root (settings are read from .env as usual):
+
+    python scripts/bench_serialization.py --rows 10000
+
+The rows are loaded into a temporary tasks table in DATABASE_URL (or
+--database-url), which only that connection sees and Postgres drops when it
+closes; the real table is not touched. Timestamps are timestamptz, so
+both paths encode timezone-aware datetimes as the API does. The numbers
+include fetching and row construction. "before" is what GET /lockin/tasks
+used to do: select(Task) into ORM objects, FastAPI's serialize_response()
+through List[TaskOut] (from_attributes) and the stdlib JSONResponse. "after"
+is the current path: a Core select of the TaskOut columns and rows_response().
+The script fails if the two bodies differ.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+from sqlalchemy import create_engine, insert, select, text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.crud.lockin import TASK_OUT_COLUMNS  # noqa: E402
+from app.db.models.lockin import Task  # noqa: E402
+from app.schemas.lockin import TaskOut  # noqa: E402
+from app.utils.serialization import rows_response  # noqa: E402
+
+# pg_temp comes first on the search path, so "tasks" means this copy. The
+# columns are declared here (without the sequence defaults) so the database
+# does not need to be migrated.
+DDL = """
+CREATE TEMPORARY TABLE tasks (
+    taskid INTEGER PRIMARY KEY, username VARCHAR NOT NULL, name VARCHAR NOT NULL, estimated_time INTEGER NOT NULL,
+    completion_time TIMESTAMPTZ, created_at TIMESTAMPTZ NOT NULL, completed BOOLEAN, taskidbyfrontend INTEGER,
+    updated_at TIMESTAMPTZ NOT NULL, deleted_at TIMESTAMPTZ, revision BIGINT NOT NULL
+)
+"""
+
+
+def load(conn, rows: int):
+    conn.execute(text(DDL))
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    conn.execute(insert(Task.__table__), [
+        {
+            "taskid": i, "username": "bench", "name": f"task {i}", "estimated_time": 25,
+            "completion_time": start + timedelta(minutes=i, microseconds=i) if i % 2 else None,
+            "created_at": start + timedelta(seconds=i), "completed": bool(i % 2),
+            "taskidbyfrontend": i, "updated_at": start, "deleted_at": None, "revision": i,
+        }
+        for i in range(rows)
+    ])
+
+
+def before(conn) -> bytes:
+    field = create_model_field(name="Response_get_tasks", type_=List[TaskOut], mode="serialization")
+    with Session(bind=conn) as session:
+        tasks = session.execute(select(Task).where(Task.username == "bench").order_by(Task.taskid)).scalars().all()
+        content = asyncio.run(serialize_response(field=field, response_content=tasks))
+    return JSONResponse(content).body
+
+
+def after(conn) -> bytes:
+    rows = conn.execute(select(*TASK_OUT_COLUMNS).where(Task.username == "bench").order_by(Task.taskid)).all()
+    return rows_response(rows).body
+
+
+def best_of(fn, conn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(conn)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url or settings.DATABASE_URL)
+    with engine.connect() as conn:
+        load(conn, args.rows)
+        if before(conn) != after(conn):
+            sys.exit("FAIL: the two paths produce different bodies")
+        for name, fn in (("before", before), ("after", after)):
+            total = best_of(fn, conn, args.repeat)
+            print(f"{name:>6}: {total * 1000:8.1f} ms for {args.rows} rows, {total / args.rows * 1e6:6.2f} µs/row, "
+                  f"{len(fn(conn))} bytes")
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
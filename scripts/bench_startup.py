@@ -0,0 +1,99 @@
+"""Startup benchmark: import time of app.main and time to the first response.
+
+Run from the repo root (settings are read from .env as usual):
+
+    python scripts/bench_startup.py --runs 5 --max-import-ms 1500
+
+Each run is a fresh interpreter. Import time comes from ``python -X
+importtime``; time-to-first-response starts uvicorn and polls /healthz,
+which answers as soon as the app is serving. With --max-import-ms the script
+exits non-zero when the median import exceeds the budget, so CI can flag
+regressions.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile() -> dict:
+    """Cumulative import time (µs) per top-level module imported by app.main."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        if cum.strip().isdigit():
+            cumulative[name.strip()] = int(cum)
+    return cumulative
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def first_response_ms(timeout: float) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1):
+                    return (time.perf_counter() - start) * 1000
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError("uvicorn exited before serving; check your .env")
+                time.sleep(0.01)
+        raise RuntimeError(f"no response from /healthz within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--skip-serve", action="store_true", help="only measure the import")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import of app.main is slower")
+    args = parser.parse_args()
+
+    profiles = [import_profile() for _ in range(args.runs)]
+    import_ms = statistics.median(p["app.main"] for p in profiles) / 1000
+    print(f"import app.main: {import_ms:.0f} ms (median of {args.runs})")
+
+    # Slowest direct dependencies, from the last run
+    last = profiles[-1]
+    top = sorted((name for name in last if name != "app.main" and ("." not in name or name.startswith("app."))),
+                 key=last.get, reverse=True)
+    for name in top[:args.top]:
+        print(f"  {last[name] / 1000:8.1f} ms  {name}")
+
+    if not args.skip_serve:
+        ttfr = statistics.median(first_response_ms(args.timeout) for _ in range(args.runs))
+        print(f"time to first response: {ttfr:.0f} ms (median of {args.runs})")
+
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"FAIL: import took {import_ms:.0f} ms, budget is {args.max_import_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
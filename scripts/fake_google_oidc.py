@@ -0,0 +1,143 @@
+"""Local stand-in for Google's OpenID endpoints (discovery, JWKS, token).
+
+Signs id_tokens with a throwaway RSA key generated at startup:
+
+    python scripts/fake_google_oidc.py --port 9010 --email someone@example.com
+
+Then run the API with
+GOOGLE_DISCOVERY_URL=http://127.0.0.1:9010/.well-known/openid-configuration
+and call /api/auth/callback/google?code=anything. Any code is accepted.
+
+The tests drive FakeGoogle in-process (see tests/test_google_oidc.py).
+"""
+import argparse
+import base64
+import hashlib
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+
+import uvicorn
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ISSUER = "https://accounts.google.com"
+
+
+def generate_key() -> tuple[str, dict]:
+    """A new RSA key as (private PEM, public JWK with a fresh kid)."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_jwk = {
+        **jwk.construct(private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode(), "RS256").to_dict(),
+        "kid": uuid.uuid4().hex,
+        "use": "sig",
+    }
+    return private_pem, public_jwk
+
+
+def at_hash(access_token: str) -> str:
+    digest = hashlib.sha256(access_token.encode()).digest()
+    return base64.urlsafe_b64encode(digest[:16]).decode().rstrip("=")
+
+
+class FakeGoogle:
+    """Discovery, JWKS and token endpoints as a Starlette app (``.app``).
+
+    ``requests`` counts hits per path, ``rotate_key()`` swaps the published
+    signing key and ``id_token()`` signs tokens with any claims overridden.
+    """
+
+    def __init__(self, base_url: str, client_id: str, email: str = "test.user@example.com", max_age: int = 300):
+        self.base_url = base_url
+        self.client_id = client_id
+        self.email = email
+        self.max_age = max_age
+        self.requests = Counter()
+        self.private_pem, self.public_jwk = generate_key()
+        self.app = Starlette(routes=[
+            Route("/.well-known/openid-configuration", self._discovery),
+            Route("/certs", self._certs),
+            Route("/token", self._token, methods=["POST"]),
+        ])
+
+    @property
+    def kid(self) -> str:
+        return self.public_jwk["kid"]
+
+    def rotate_key(self):
+        self.private_pem, self.public_jwk = generate_key()
+
+    def id_token(self, access_token: str | None = None, private_pem: str | None = None, kid: str | None = None, **claims) -> str:
+        now = int(time.time())
+        payload = {
+            "iss": ISSUER,
+            "aud": self.client_id,
+            "sub": hashlib.sha1(self.email.encode()).hexdigest(),
+            "email": self.email,
+            "email_verified": True,
+            "iat": now,
+            "exp": now + 3600,
+        }
+        if access_token is not None:
+            payload["at_hash"] = at_hash(access_token)
+        payload.update(claims)
+        return jwt.encode(payload, private_pem or self.private_pem, algorithm="RS256", headers={"kid": kid or self.kid})
+
+    def _cached(self, content: dict) -> JSONResponse:
+        return JSONResponse(content, headers={"Cache-Control": f"public, max-age={self.max_age}"})
+
+    async def _discovery(self, request):
+        self.requests[request.url.path] += 1
+        return self._cached({
+            "issuer": ISSUER,
+            "token_endpoint": f"{self.base_url}/token",
+            "jwks_uri": f"{self.base_url}/certs",
+        })
+
+    async def _certs(self, request):
+        self.requests[request.url.path] += 1
+        return self._cached({"keys": [self.public_jwk]})
+
+    async def _token(self, request):
+        self.requests[request.url.path] += 1
+        access_token = uuid.uuid4().hex
+        return JSONResponse({
+            "access_token": access_token,
+            "id_token": self.id_token(access_token),
+            "token_type": "Bearer",
+            "expires_in": 3599,
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9010)
+    parser.add_argument("--client-id", default=None, help="audience for issued tokens (defaults to GOOGLE_CLIENT_ID)")
+    parser.add_argument("--email", default="test.user@example.com")
+    parser.add_argument("--max-age", type=int, default=300, help="Cache-Control max-age for discovery and JWKS")
+    args = parser.parse_args()
+
+    client_id = args.client_id
+    if client_id is None:
+        from app.core.config import settings
+        client_id = settings.GOOGLE_CLIENT_ID
+    fake = FakeGoogle(f"http://{args.host}:{args.port}", client_id, args.email, args.max_age)
+    uvicorn.run(fake.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Add the next ES256 signing key to JWT_KEYS_FILE and drop keys nobody needs.
+
+Run it on a schedule (e.g. weekly from cron) from the repo root:
+
+    python scripts/rotate_jwt_keys.py --lead-hours 24
+
+The new key is published in the JWKS immediately but only signs tokens once
+--lead-hours have passed, so downstream services caching the JWKS (for up
+to JWKS_MAX_AGE_SECONDS) already have it. A key is pruned once a newer key
+has been signing for longer than the longest token lifetime. Running apps
+pick up the changed file within a minute; no restart is needed.
+"""
+import argparse
+import json
+import os
+import secrets
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+
+
+def new_key(active_from: datetime) -> dict:
+    private = ec.generate_private_key(ec.SECP256R1())
+    pem = private.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    return {
+        "kid": f"{active_from:%Y%m%d}-{secrets.token_hex(4)}",
+        "active_from": active_from.isoformat(),
+        "private_key": pem,
+    }
+
+
+def prune(keys: list, now: datetime, retention: timedelta) -> list:
+    keys = sorted(keys, key=lambda key: key["active_from"])
+    kept = []
+    for i, key in enumerate(keys):
+        successor = keys[i + 1] if i + 1 < len(keys) else None
+        # Tokens signed with this key stop being issued when the successor activates
+        if successor is not None and datetime.fromisoformat(successor["active_from"]) + retention < now:
+            continue
+        kept.append(key)
+    return kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default=settings.JWT_KEYS_FILE, help="defaults to JWT_KEYS_FILE")
+    parser.add_argument("--lead-hours", type=float, default=24, help="delay before the new key starts signing")
+    args = parser.parse_args()
+    if not args.file:
+        parser.error("set JWT_KEYS_FILE or pass --file")
+
+    if args.lead_hours * 3600 < settings.JWKS_MAX_AGE_SECONDS:
+        print(f"warning: --lead-hours is shorter than JWKS_MAX_AGE_SECONDS ({settings.JWKS_MAX_AGE_SECONDS}s); "
+              "downstream caches may see tokens signed with a key they do not know yet")
+
+    keys = []
+    if os.path.exists(args.file):
+        with open(args.file) as f:
+            keys = json.load(f)["keys"]
+
+    now = datetime.now(timezone.utc)
+    # Brand-new key file: the first key signs straight away
+    active_from = now if not keys else now + timedelta(hours=args.lead_hours)
+    keys.append(new_key(active_from))
+    # ACCESS_TOKEN_EXPIRE_MINUTES is currently applied as days, so take the larger
+    retention = timedelta(days=max(settings.ACCESS_TOKEN_EXPIRE_MINUTES, settings.REFRESH_TOKEN_EXPIRE_DAYS))
+    kept = prune(keys, now, retention)
+
+    tmp = f"{args.file}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump({"keys": kept}, f, indent=2)
+    os.replace(tmp, args.file)
+
+    print(f"added {keys[-1]['kid']} (signs from {active_from:%Y-%m-%d %H:%M} UTC), "
+          f"pruned {len(keys) - len(kept)}, {len(kept)} keys in {args.file}")
+
+
+if __name__ == "__main__":
+    main()
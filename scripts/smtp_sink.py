@@ -0,0 +1,92 @@
+"""Local stand-in SMTP server for email worker throughput tests.
+
+Accepts any AUTH, swallows every message and prints the delivery rate:
+
+    python scripts/smtp_sink.py --port 2525
+
+Point the worker at it with SMTP_HOST=127.0.0.1 SMTP_PORT=2525
+SMTP_STARTTLS=false. --delay adds per-message latency to mimic a slow relay.
+"""
+import argparse
+import asyncio
+import time
+
+received = 0
+
+
+class SinkProtocol(asyncio.Protocol):
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.buffer = b""
+        self.in_data = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.transport.write(b"220 smtp-sink ready\r\n")
+
+    def data_received(self, data):
+        self.buffer += data
+        while True:
+            if self.in_data:
+                end = self.buffer.find(b"\r\n.\r\n")
+                if end < 0:
+                    return
+                self.buffer = self.buffer[end + 5:]
+                self.in_data = False
+                asyncio.get_running_loop().create_task(self._accept_message())
+                continue
+            line, sep, rest = self.buffer.partition(b"\r\n")
+            if not sep:
+                return
+            self.buffer = rest
+            self._command(line.decode(errors="replace"))
+
+    async def _accept_message(self):
+        global received
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        received += 1
+        self.transport.write(b"250 OK queued\r\n")
+
+    def _command(self, line: str):
+        verb = line.split(" ", 1)[0].upper()
+        if verb == "EHLO":
+            self.transport.write(b"250-smtp-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+        elif verb == "AUTH":
+            self.transport.write(b"235 Authentication successful\r\n")
+        elif verb == "DATA":
+            self.in_data = True
+            self.transport.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+        elif verb == "QUIT":
+            self.transport.write(b"221 Bye\r\n")
+            self.transport.close()
+        else:
+            # HELO, MAIL, RCPT, RSET, NOOP
+            self.transport.write(b"250 OK\r\n")
+
+
+async def report(interval: float):
+    last, last_time = 0, time.monotonic()
+    while True:
+        await asyncio.sleep(interval)
+        now = time.monotonic()
+        print(f"{received} messages total, {(received - last) / (now - last_time):.1f} msg/s", flush=True)
+        last, last_time = received, now
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before accepting each message")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between rate reports")
+    args = parser.parse_args()
+
+    server = await asyncio.get_running_loop().create_server(lambda: SinkProtocol(args.delay), args.host, args.port)
+    print(f"SMTP sink listening on {args.host}:{args.port}", flush=True)
+    async with server:
+        await asyncio.gather(server.serve_forever(), report(args.interval))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
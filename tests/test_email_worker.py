@@ -0,0 +1,22 @@
+import smtplib
+
+import pytest
+
+from app.workers.email_worker import is_permanent_failure
+
+
+@pytest.mark.parametrize("error, permanent", [
+    (smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no such user")}), True),
+    (smtplib.SMTPRecipientsRefused({"a@example.com": (450, b"mailbox busy")}), False),
+    (smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no"), "b@example.com": (451, b"later")}), False),
+    (smtplib.SMTPDataError(554, b"message rejected"), True),
+    (smtplib.SMTPResponseException(552, b"too big"), True),
+    (smtplib.SMTPDataError(451, b"try again"), False),
+    (smtplib.SMTPAuthenticationError(535, b"bad credentials"), False),
+    (smtplib.SMTPSenderRefused(553, b"sender not allowed", "noreply@example.com"), False),
+    (smtplib.SMTPConnectError(554, b"go away"), False),
+    (smtplib.SMTPServerDisconnected("gone"), False),
+    (ConnectionResetError(), False),
+])
+def test_is_permanent_failure(error, permanent):
+    assert is_permanent_failure(error) is permanent
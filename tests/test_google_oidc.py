@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from jose import JWTError
+
+from app.core.config import settings
+from app.services import google_oidc
+from scripts.fake_google_oidc import FakeGoogle, generate_key
+
+BASE_URL = "http://fake-google"
+MAX_AGE = 600
+
+
+@pytest.fixture
+def google(monkeypatch):
+    """The stand-in served in-process, with empty discovery and JWKS caches."""
+    fake = FakeGoogle(BASE_URL, settings.GOOGLE_CLIENT_ID, max_age=MAX_AGE)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app))
+    monkeypatch.setattr(settings, "GOOGLE_DISCOVERY_URL", f"{BASE_URL}/.well-known/openid-configuration")
+    monkeypatch.setattr(google_oidc, "get_http_client", lambda: client)
+    monkeypatch.setattr(google_oidc, "_discovery", google_oidc._CachedJSON(google_oidc._discovery_url))
+    monkeypatch.setattr(google_oidc, "_jwks", google_oidc._CachedJSON(google_oidc._jwks_url))
+    return fake
+
+
+def age(cache, seconds):
+    """Pretend ``cache`` was fetched ``seconds`` earlier than it was."""
+    cache._fetched_at -= seconds
+
+
+def test_valid_token(google):
+    access_token = "access"
+    claims = asyncio.run(google_oidc.verify_id_token(google.id_token(access_token), access_token))
+    assert (claims["email"], claims["aud"]) == (google.email, settings.GOOGLE_CLIENT_ID)
+
+
+@pytest.mark.parametrize("overrides", [
+    {"aud": "someone-else"},
+    {"iss": "https://accounts.example.com"},
+    {"exp": int(time.time()) - 60},
+    {"private_pem": generate_key()[0]},
+])
+def test_rejected_token(google, overrides):
+    with pytest.raises(JWTError):
+        asyncio.run(google_oidc.verify_id_token(google.id_token(**overrides)))
+
+
+def test_at_hash_must_match_access_token(google):
+    with pytest.raises(JWTError):
+        asyncio.run(google_oidc.verify_id_token(google.id_token("issued"), "another"))
+
+
+def test_jwks_follows_cache_control_max_age(google):
+    jwks = google_oidc._jwks
+
+    async def main():
+        await google_oidc.verify_id_token(google.id_token())
+        assert google.requests["/certs"] == 1
+
+        age(jwks, MAX_AGE * 0.5)
+        await google_oidc.verify_id_token(google.id_token())
+        assert google.requests["/certs"] == 1
+
+        # Past the refresh-ahead point: answered from cache, refetched behind it
+        age(jwks, MAX_AGE * 0.35)
+        await google_oidc.verify_id_token(google.id_token())
+        await jwks._refresh_task
+        assert google.requests["/certs"] == 2
+
+        age(jwks, MAX_AGE)
+        await google_oidc.verify_id_token(google.id_token())
+        assert google.requests["/certs"] == 3
+        assert google.requests["/.well-known/openid-configuration"] == 1
+
+    asyncio.run(main())
+
+
+def test_unknown_kid_refetches_jwks_at_most_once_a_minute(google):
+    jwks = google_oidc._jwks
+
+    async def main():
+        await google_oidc.verify_id_token(google.id_token())
+        google.rotate_key()
+        token = google.id_token()
+
+        with pytest.raises(JWTError, match="Unknown signing key"):
+            await google_oidc.verify_id_token(token)
+        assert google.requests["/certs"] == 1
+
+        age(jwks, google_oidc.MIN_FORCED_REFRESH_SECONDS)
+        claims = await google_oidc.verify_id_token(token)
+        assert claims["email"] == google.email
+        assert google.requests["/certs"] == 2
+
+    asyncio.run(main())
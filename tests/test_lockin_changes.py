@@ -0,0 +1,58 @@
+from sqlalchemy import insert
+
+from app.crud.lockin import get_changes
+from app.db.models.lockin import SavedTask, Task
+from tests.conftest import run_with_session
+
+
+def changes(username, since=0, limit=100):
+    feed = run_with_session(lambda session: get_changes(session, username, since, limit))
+    names = [row.name for row in feed["tasks"]] + [row.name for row in feed["saved_tasks"]]
+    return sorted(names), feed["next_cursor"], feed["has_more"]
+
+
+def task(username, name, taskidbyfrontend):
+    return insert(Task).values(username=username, name=name, estimated_time=25, taskidbyfrontend=taskidbyfrontend)
+
+
+def test_in_flight_write_holds_back_later_commits(pg_engine, pg_user):
+    username = pg_user["username"]
+    with pg_engine.connect() as slow, pg_engine.connect() as fast:
+        slow.execute(task(username, "slow", 1))
+        fast.execute(task(username, "fast", 2))
+        fast.commit()
+        # "fast" committed first, but "slow" started writing before it and may
+        # still commit with the lower revision, so the cursor must not pass it
+        assert changes(username) == ([], 0, False)
+        slow.commit()
+    names, cursor, _ = changes(username)
+    assert names == ["fast", "slow"]
+    assert changes(username, since=cursor) == ([], cursor, False)
+
+
+def test_commit_after_cursor_is_not_skipped(pg_engine, pg_user):
+    username = pg_user["username"]
+    with pg_engine.connect() as first, pg_engine.connect() as second:
+        first.execute(task(username, "first", 1))
+        first.commit()
+        second.execute(task(username, "second", 2))
+        names, cursor, _ = changes(username)
+        assert names == ["first"]
+        second.commit()
+    assert changes(username, since=cursor)[0] == ["second"]
+
+
+def test_page_does_not_split_a_transaction(pg_engine, pg_user):
+    username = pg_user["username"]
+    with pg_engine.begin() as conn:
+        conn.execute(insert(Task), [
+            {"username": username, "name": f"batch{i}", "estimated_time": 25, "taskidbyfrontend": i} for i in range(3)
+        ])
+        conn.execute(insert(SavedTask).values(username=username, name="saved", estimated_time=25))
+    with pg_engine.begin() as conn:
+        conn.execute(task(username, "later", 10))
+
+    names, cursor, has_more = changes(username, limit=2)
+    assert names == ["batch0", "batch1", "batch2", "saved"]
+    assert has_more
+    assert changes(username, since=cursor, limit=2)[0] == ["later"]
@@ -0,0 +1,47 @@
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+
+from app.api.v1 import lockin as lockin_routes
+from app.db.models.lockin import Task
+
+
+def add_tasks(pg_engine, username):
+    with pg_engine.begin() as conn:
+        conn.execute(insert(Task), [
+            {"username": username, "name": "a", "estimated_time": 25, "taskidbyfrontend": 1, "deleted_at": None},
+            {"username": username, "name": "b", "estimated_time": 25, "taskidbyfrontend": 2, "deleted_at": datetime.now(timezone.utc)},
+        ])
+
+
+def lines(body: bytes) -> list:
+    return [json.loads(line)["name"] for line in body.splitlines()]
+
+
+def test_export(pg_engine, pg_user, client):
+    add_tasks(pg_engine, pg_user["username"])
+    response = client.get("/lockin/tasks/export", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert lines(response.content) == ["a"]
+
+    response = client.get("/lockin/tasks/export", params={"include_deleted": True}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    # httpx has already gunzipped the body
+    assert lines(response.content) == ["a", "b"]
+
+
+def test_export_of_no_tasks_is_empty(pg_engine, pg_user, client):
+    response = client.get("/lockin/tasks/export")
+    assert (response.status_code, response.content) == (200, b"")
+
+
+def test_export_query_failure_is_a_500(pg_engine, pg_user, client, monkeypatch):
+    async def failing_stream(db, username, **kwargs):
+        raise RuntimeError("database went away")
+        yield
+
+    monkeypatch.setattr(lockin_routes, "stream_tasks", failing_stream)
+    response = client.get("/lockin/tasks/export")
+    assert response.status_code == 500
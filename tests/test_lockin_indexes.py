@@ -0,0 +1,40 @@
+"""The per-user lookups on tasks and saved_tasks are answered from their indexes."""
+from sqlalchemy import insert, text
+
+from app.db.models.lockin import SavedTask, Task
+
+
+def explain(conn, sql: str, **params) -> str:
+    # The tables are tiny, so keep the planner off sequential scans and check
+    # that an index is usable at all rather than what it costs
+    conn.execute(text("SET LOCAL enable_seqscan = off"))
+    return "\n".join(conn.execute(text(f"EXPLAIN {sql}"), params).scalars())
+
+
+def test_task_lookup_by_frontend_id_uses_index(pg_engine, pg_user):
+    with pg_engine.begin() as conn:
+        conn.execute(insert(Task), [
+            {"username": pg_user["username"], "name": f"t{i}", "estimated_time": 25, "taskidbyfrontend": i}
+            for i in range(200)
+        ])
+        conn.execute(text("ANALYZE tasks"))
+        plan = explain(
+            conn,
+            "SELECT * FROM tasks WHERE username = :username AND taskidbyfrontend = :id AND deleted_at IS NULL",
+            username=pg_user["username"], id=42,
+        )
+    assert "ix_tasks_username_taskidbyfrontend" in plan, plan
+
+
+def test_saved_tasks_by_user_uses_index(pg_engine, pg_user):
+    with pg_engine.begin() as conn:
+        conn.execute(insert(SavedTask), [
+            {"username": pg_user["username"], "name": f"s{i}", "estimated_time": 25} for i in range(200)
+        ])
+        conn.execute(text("ANALYZE saved_tasks"))
+        plan = explain(
+            conn,
+            "SELECT * FROM saved_tasks WHERE username = :username AND deleted_at IS NULL",
+            username=pg_user["username"],
+        )
+    assert "ix_saved_tasks_username" in plan, plan
@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.crud.lockin import TaskIdConflict, apply_task_batch, update_task
+from app.db.models.lockin import Task
+from app.schemas.lockin import TaskBatchOperation
+from tests.conftest import run_with_session
+
+
+@pytest.mark.parametrize("deleted", [False, True])
+def test_update_onto_taken_frontend_id_conflicts(pg_engine, pg_user, deleted):
+    with pg_engine.begin() as conn:
+        conn.execute(insert(Task), [
+            {"username": pg_user["username"], "name": "a", "estimated_time": 25, "taskidbyfrontend": 1, "deleted_at": None},
+            {"username": pg_user["username"], "name": "b", "estimated_time": 25, "taskidbyfrontend": 2,
+             "deleted_at": datetime.now(timezone.utc) if deleted else None},
+        ])
+
+    async def rename(session):
+        with pytest.raises(TaskIdConflict):
+            await update_task(session, pg_user["username"], 1, {"taskidbyfrontend": 2})
+        # Rolled back, so the session is usable and nothing changed
+        return (await session.execute(select(Task.name).where(Task.taskidbyfrontend == 1))).scalar_one()
+
+    assert run_with_session(rename) == "a"
+    with pg_engine.connect() as conn:
+        tombstone = conn.execute(select(Task.deleted_at.is_not(None)).where(Task.taskidbyfrontend == 2)).scalar_one()
+    assert tombstone is deleted
+
+
+def test_update_returns_row(pg_engine, pg_user):
+    with pg_engine.begin() as conn:
+        conn.execute(insert(Task).values(username=pg_user["username"], name="a", estimated_time=25, taskidbyfrontend=1))
+
+    async def rename(session):
+        row = await update_task(session, pg_user["username"], 1, {"name": "renamed", "taskidbyfrontend": 3})
+        await session.commit()
+        return row
+
+    row = run_with_session(rename)
+    assert (row["name"], row["taskidbyfrontend"]) == ("renamed", 3)
+    assert run_with_session(lambda session: update_task(session, pg_user["username"], 1, {"name": "x"})) is None
+
+
+def batch(username, *operations):
+    ops = [TaskBatchOperation(**op) for op in operations]
+
+    async def apply(session):
+        results = await apply_task_batch(session, username, ops)
+        await session.commit()
+        return results
+
+    return run_with_session(apply)
+
+
+def test_batch_update_keeps_fields_it_leaves_out(pg_engine, pg_user):
+    username = pg_user["username"]
+    done = datetime(2026, 1, 2, tzinfo=timezone.utc)
+    batch(username, {"op": "create", "taskidbyfrontend": 1, "name": "a", "estimated_time": 25,
+                     "completed": True, "completion_time": done})
+    [result] = batch(username, {"op": "update", "taskidbyfrontend": 1, "name": "renamed", "estimated_time": 30})
+    assert result["status"] == "updated"
+    assert (result["task"]["name"], result["task"]["completed"], result["task"]["completion_time"]) == ("renamed", True, done)
+    [result] = batch(username, {"op": "update", "taskidbyfrontend": 1, "name": "renamed", "estimated_time": 30,
+                                "completed": False})
+    assert (result["task"]["completed"], result["task"]["completion_time"]) == (False, done)
+
+
+def test_batch_revives_tombstone_like_create(pg_engine, pg_user):
+    username = pg_user["username"]
+    old = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    with pg_engine.begin() as conn:
+        conn.execute(insert(Task).values(username=username, name="a", estimated_time=25, taskidbyfrontend=1,
+                                         completed=True, completion_time=old, created_at=old, deleted_at=old))
+    [result] = batch(username, {"op": "update", "taskidbyfrontend": 1, "name": "back", "estimated_time": 25})
+    task = result["task"]
+    assert (task["deleted_at"], task["completed"], task["completion_time"]) == (None, False, None)
+    assert task["created_at"] > old
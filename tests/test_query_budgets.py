@@ -0,0 +1,16 @@
+from sqlalchemy import insert
+
+from app.db.instrumentation import query_budget
+from app.db.models.lockin import Task
+
+
+def test_list_tasks_is_one_query(pg_engine, pg_user, client):
+    with pg_engine.begin() as conn:
+        conn.execute(insert(Task), [
+            {"username": pg_user["username"], "name": f"t{i}", "estimated_time": 25, "taskidbyfrontend": i} for i in range(5)
+        ])
+    with query_budget(1):
+        response = client.get("/lockin/tasks", params={"limit": 3})
+    assert response.status_code == 200
+    assert [task["name"] for task in response.json()] == ["t0", "t1", "t2"]
+    assert "X-Next-Cursor" in response.headers
@@ -0,0 +1,121 @@
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from jose import JWTError, jwt
+
+from app.core import security
+from app.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    security.verified_tokens.clear()
+    yield
+    security.verified_tokens.clear()
+
+
+@pytest.fixture
+def verifications(monkeypatch):
+    """Counts the real signature checks behind decode_token."""
+    calls = []
+    verify = security._verify
+
+    def counting_verify(token):
+        calls.append(token)
+        return verify(token)
+
+    monkeypatch.setattr(security, "_verify", counting_verify)
+    return calls
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """The cache's view of time.time(), settable via ``clock.now``."""
+    fake = SimpleNamespace(now=time.time(), perf_counter=time.perf_counter)
+    fake.time = lambda: fake.now
+    monkeypatch.setattr(security, "time", fake)
+    return fake
+
+
+def test_repeat_token_is_served_from_cache(verifications):
+    token = security.create_access_token({"sub": "a@example.com"})
+    claims = security.decode_token(token)
+    claims["sub"] = "mutated by the caller"
+    assert security.decode_token(token)["sub"] == "a@example.com"
+    assert len(verifications) == 1
+
+
+def test_entry_expires_at_token_exp(verifications, clock):
+    token = security.create_access_token({"sub": "a@example.com"}, timedelta(minutes=5))
+    exp = jwt.get_unverified_claims(token)["exp"]
+
+    security.decode_token(token)
+    clock.now = exp - 1
+    security.decode_token(token)
+    assert len(verifications) == 1
+
+    clock.now = exp
+    security.decode_token(token)
+    assert len(verifications) == 2
+
+
+def test_entry_expires_at_verification_cutoff(clock):
+    cache = security.VerifiedTokenCache(maxsize=10)
+    cache.set(b"key", {"exp": clock.now + 3600}, until=clock.now + 60)
+    clock.now += 59
+    assert cache.get(b"key") is not None
+    clock.now += 1
+    assert cache.get(b"key") is None
+
+
+def test_tampered_token_is_rejected_after_genuine_one_is_cached(verifications):
+    token = security.create_access_token({"sub": "a@example.com"})
+    security.decode_token(token)
+
+    header, payload, signature = token.split(".")
+    # A well-formed payload from another genuine token, under this signature
+    forged = security.create_access_token({"sub": "admin@example.com"}).split(".")[1]
+    for tampered in (
+        f"{header}.{forged}.{signature}",
+        f"{header}.{payload}.{signature[:-2]}AA",
+        jwt.encode(jwt.get_unverified_claims(token), "another-secret", algorithm=settings.ALGORITHM),
+    ):
+        with pytest.raises(JWTError):
+            security.decode_token(tampered)
+        # Still not cached: a second try is verified (and rejected) again
+        with pytest.raises(JWTError):
+            security.decode_token(tampered)
+    assert len(verifications) == 1 + 3 * 2
+
+
+def test_expired_token_is_not_cached(verifications):
+    token = security.create_access_token({"sub": "a@example.com"}, timedelta(seconds=-1))
+    for _ in range(2):
+        with pytest.raises(JWTError):
+            security.decode_token(token)
+    assert len(verifications) == 2
+
+
+def test_token_without_exp_is_not_cached(verifications):
+    token = jwt.encode({"sub": "a@example.com"}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    security.decode_token(token)
+    security.decode_token(token)
+    assert len(verifications) == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = security.VerifiedTokenCache(maxsize=2)
+    exp = time.time() + 60
+    cache.set(b"a", {"exp": exp})
+    cache.set(b"b", {"exp": exp})
+    cache.get(b"a")
+    cache.set(b"c", {"exp": exp})
+    assert (cache.get(b"a"), cache.get(b"b"), cache.get(b"c")) == ({"exp": exp}, None, {"exp": exp})
+
+
+def test_zero_maxsize_disables_cache():
+    cache = security.VerifiedTokenCache(maxsize=0)
+    cache.set(b"a", {"exp": time.time() + 60})
+    assert cache.get(b"a") is None
@@ -0,0 +1,21 @@
+import pytest
+
+from app.utils.serialization import accepts_gzip
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ("gzip", True),
+    ("deflate, gzip;q=0.5", True),
+    ("gzip;q=0", False),
+    ("gzip; q=0.0, br", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("gzip;q=0, *", False),
+    ("identity, *;q=0.1", True),
+    ("GZIP", True),
+    ("x-gzip", True),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
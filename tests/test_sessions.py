@@ -0,0 +1,121 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from jose import jwt
+
+from app.services import sessions
+
+USER = SimpleNamespace(id=7, email="tester@example.com")
+REQUEST = SimpleNamespace(client=SimpleNamespace(host="127.0.0.1"), headers={"user-agent": "pytest"})
+
+
+@pytest.fixture(autouse=True)
+def no_bloom(monkeypatch):
+    monkeypatch.setattr(sessions, "_bloom", None)
+
+
+async def login():
+    """(sid, jti) of a new session's refresh token."""
+    tokens = await sessions.start_session(USER, REQUEST, "password")
+    claims = jwt.get_unverified_claims(tokens["refresh_token"])
+    assert jwt.get_unverified_claims(tokens["access_token"])["sid"] == claims["sid"]
+    return claims["sid"], claims["jti"]
+
+
+def test_refresh_token_rotates_once(fake_redis):
+    async def main():
+        sid, jti = await login()
+        user_id, new_jti = await sessions.rotate_refresh_token(sid, jti)
+        assert (user_id, new_jti != jti) == (USER.id, True)
+        assert (await sessions.rotate_refresh_token(sid, new_jti))[0] == USER.id
+        assert await sessions.has_session(USER.id, sid)
+        assert not await sessions.is_session_revoked(sid)
+
+    asyncio.run(main())
+
+
+def test_replayed_refresh_token_revokes_the_family(fake_redis):
+    async def main():
+        sid, jti = await login()
+        _, new_jti = await sessions.rotate_refresh_token(sid, jti)
+
+        assert await sessions.rotate_refresh_token(sid, jti) is None
+        # The legitimate holder's token dies with the family
+        assert await sessions.rotate_refresh_token(sid, new_jti) is None
+        assert not await sessions.has_session(USER.id, sid)
+        assert await sessions.is_session_revoked(sid)
+        assert await sessions.list_sessions(USER.id) == []
+
+    asyncio.run(main())
+
+
+def test_unknown_session_cannot_refresh(fake_redis):
+    assert asyncio.run(sessions.rotate_refresh_token("0" * 32, "jti")) is None
+
+
+@pytest.mark.parametrize("bloom", [False, True])
+def test_revoked_session_is_rejected(fake_redis, monkeypatch, bloom):
+    async def main():
+        revoked, _ = await login()
+        live, _ = await login()
+        if bloom:
+            monkeypatch.setattr(sessions, "_bloom", await sessions._load_bloom())
+        await sessions.revoke_session(USER.id, revoked)
+
+        assert await sessions.is_session_revoked(revoked)
+        assert not await sessions.is_session_revoked(live)
+        assert [session["sid"] for session in await sessions.list_sessions(USER.id)] == [live]
+
+    asyncio.run(main())
+
+
+def test_bloom_filter_loads_unexpired_revocations(fake_redis, monkeypatch):
+    async def main():
+        await fake_redis.zadd(sessions.REVOKED_KEY, {"expired": time.time() - 1, "revoked": time.time() + 60})
+        bloom = await sessions._load_bloom()
+        assert "revoked" in bloom
+        monkeypatch.setattr(sessions, "_bloom", bloom)
+        assert await sessions.is_session_revoked("revoked")
+        assert not await sessions.is_session_revoked("expired")
+
+    asyncio.run(main())
+
+
+def test_bloom_filter_skips_redis_for_sessions_never_revoked(fake_redis, monkeypatch):
+    async def main():
+        monkeypatch.setattr(sessions, "_bloom", await sessions._load_bloom())
+        # The filter is trusted (pub/sub keeps it in sync), so a revocation it
+        # never heard of is not looked up
+        await fake_redis.zadd(sessions.REVOKED_KEY, {"missed": time.time() + 60})
+        assert not await sessions.is_session_revoked("missed")
+
+    asyncio.run(main())
+
+
+def test_bookkeeping_fields_are_not_sessions(fake_redis):
+    async def main():
+        sid, _ = await login()
+        assert await sessions.has_session(USER.id, sid)
+        assert not await sessions.has_session(USER.id, f"{sid}:last_used")
+
+    asyncio.run(main())
+
+
+def test_delete_session_route_only_takes_session_ids(fake_redis):
+    from fastapi.testclient import TestClient
+
+    from app.api.deps import get_current_user
+    from app.main import app
+
+    sid, _ = asyncio.run(login())
+    app.dependency_overrides[get_current_user] = lambda: USER
+    try:
+        client = TestClient(app)
+        assert client.delete(f"/user/sessions/{sid}:last_used").status_code == 422
+        assert client.delete(f"/user/sessions/{'0' * 32}").status_code == 404
+        assert client.delete(f"/user/sessions/{sid}").status_code == 204
+    finally:
+        app.dependency_overrides.clear()
+    assert asyncio.run(fake_redis.zrange(sessions.REVOKED_KEY, 0, -1)) == [sid]